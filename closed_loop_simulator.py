@@ -0,0 +1,144 @@
+import itertools
+import time
+import numpy as np
+
+import tuning_rules
+from wheel_controller import pid_step
+
+# Batched closed-loop simulation of the wheel speed loop for PID gain sweeps.
+#
+# Every gain set (Kc, TI, TD, bias, SAMPLE_TIME) is one lane of a NumPy array
+# and all lanes step together.  The plant is the FOPDT wheel model
+#   tau * dy/dt = -y + K * u(t - theta)
+# integrated exactly over a fine step h, with the dead time as a ring buffer
+# of past power.  The controller is the same pid_step and 0-100% clamp the
+# car runs, fed through the same moving-average RPM filter, and updates only
+# in the lanes whose sample time has come up.
+
+
+def gain_grid(**ranges):
+    """ Cartesian product of parameter ranges, e.g. gain_grid(Kc=[1, 2], TI=[1, 2])
+    -> {'Kc': array([1, 1, 2, 2]), 'TI': array([1, 2, 1, 2])} """
+    names = list(ranges)
+    combos = np.array(list(itertools.product(*(np.atleast_1d(ranges[n]) for n in names))), dtype=float)
+    return {name: combos[:, i] for i, name in enumerate(names)}
+
+
+def simulate(Kc, TI=np.inf, TD=0.0, bias=0.0, sample_time=0.1, K=1.16, tau=0.982, theta=0.346,
+             setpoint=80.0, duration=40.0, h=0.005, rpm_window=20, settle_band=0.02):
+    """ Simulate a setpoint step from rest for every lane, returns a dict of metric arrays
+
+    All controller and plant arguments broadcast against each other.
+    Metrics: rise_time (10-90%), overshoot (% of setpoint), settling_time
+    (last exit from the +/- settle_band band), IAE, ITAE and the final RPM.
+    """
+    Kc, TI, TD, bias, sample_time, K, tau, theta, setpoint = np.broadcast_arrays(
+        *[np.asarray(v, dtype=float) for v in (Kc, TI, TD, bias, sample_time, K, tau, theta, setpoint)])
+    shape = Kc.shape
+    Kc, TI, TD, bias, sample_time, K, tau, theta, setpoint = (
+        v.ravel() for v in (Kc, TI, TD, bias, sample_time, K, tau, theta, setpoint))
+    n = Kc.size
+    lanes = np.arange(n)
+
+    # plant state, dead time buffer of past power (one slot per step of h)
+    y = np.zeros(n)
+    decay = -np.expm1(-h / tau)
+    delay = np.rint(theta / h).astype(int)
+    buffer_len = int(delay.max()) + 1
+    u_history = np.zeros((buffer_len, n))
+
+    # controller state
+    u = np.zeros(n)
+    integral = np.zeros(n)
+    prev_error = np.zeros(n)
+    rpm_buffer = np.zeros((rpm_window, n))
+    rpm_index = np.zeros(n, dtype=int)
+    rpm_total = np.zeros(n)
+    next_sample = sample_time.copy()
+    last_sample = np.zeros(n)
+
+    # metrics
+    iae = np.zeros(n)
+    itae = np.zeros(n)
+    peak = np.zeros(n)
+    t10 = np.full(n, np.nan)
+    t90 = np.full(n, np.nan)
+    last_outside = np.zeros(n)
+
+    steps = int(round(duration / h))
+    for k in range(1, steps + 1):
+        t = k * h
+
+        # plant: power from theta ago drives the first order response
+        slot = k % buffer_len
+        u_history[slot] = u
+        u_delayed = u_history[(k - delay) % buffer_len, lanes]
+        y += (K * u_delayed - y) * decay
+
+        # controller, in the lanes that are due a sample
+        due = t >= next_sample - 1e-12
+        if due.any():
+            idx = np.flatnonzero(due)
+            dt = t - last_sample[idx]
+            last_sample[idx] = t
+            next_sample[idx] += sample_time[idx]
+
+            # moving average RPM filter, as on the car
+            slots = rpm_index[idx]
+            rpm_total[idx] += y[idx] - rpm_buffer[slots, idx]
+            rpm_buffer[slots, idx] = y[idx]
+            rpm_index[idx] = (slots + 1) % rpm_window
+            rpm = rpm_total[idx] / rpm_window
+
+            error = setpoint[idx] - rpm
+            output, integral[idx] = pid_step(error, prev_error[idx], integral[idx], dt,
+                                             Kc[idx], TI[idx], TD[idx])
+            prev_error[idx] = error
+            u[idx] = np.clip(output + bias[idx], 0, 100)
+
+        # metrics on the true wheel speed
+        abs_error = np.abs(setpoint - y)
+        iae += abs_error * h
+        itae += t * abs_error * h
+        np.maximum(peak, y, out=peak)
+        t10[np.isnan(t10) & (y >= 0.1 * setpoint)] = t
+        t90[np.isnan(t90) & (y >= 0.9 * setpoint)] = t
+        last_outside[abs_error > settle_band * np.abs(setpoint)] = t
+
+    settled = last_outside < duration - h / 2
+    results = {
+        'rise_time': t90 - t10,
+        'overshoot': np.maximum(peak - setpoint, 0) / setpoint * 100,
+        'settling_time': np.where(settled, last_outside, np.nan),
+        'IAE': iae,
+        'ITAE': itae,
+        'final_rpm': y.copy(),
+    }
+    return {name: value.reshape(shape) for name, value in results.items()}
+
+
+def rank(params, results, by='ITAE', top=10):
+    """ Rows of the best `top` lanes by a metric (NaN metrics last) """
+    order = np.argsort(np.where(np.isnan(results[by]), np.inf, results[by]), axis=None)[:top]
+    return [{**{name: float(v.ravel()[i]) for name, v in params.items()},
+             **{name: float(v.ravel()[i]) for name, v in results.items()}} for i in order]
+
+
+if __name__ == "__main__":
+    # Left wheel FOPDT model, sweep around the ITAE PID gains
+    K, tau, theta = 1.16, 0.982, 0.346
+    Kc0, TI0, TD0 = tuning_rules.itae_pid(K, tau, theta)
+    params = gain_grid(Kc=Kc0 * np.linspace(0.25, 2, 12),
+                       TI=TI0 * np.linspace(0.5, 3, 10),
+                       TD=TD0 * np.linspace(0, 2, 5),
+                       bias=[20, 40, 60],
+                       sample_time=[0.05, 0.1, 0.2])
+    start = time.perf_counter()
+    results = simulate(params['Kc'], params['TI'], params['TD'], params['bias'], params['sample_time'],
+                       K, tau, theta, duration=20)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {params['Kc'].size} gain sets x 20 s in {elapsed:.2f} s")
+    for row in rank(params, results):
+        print(f"Kc={row['Kc']:.2f} TI={row['TI']:.2f} TD={row['TD']:.3f} bias={row['bias']:.0f} "
+              f"Ts={row['sample_time']:.2f}: rise {row['rise_time']:.2f} s, overshoot {row['overshoot']:.1f}%, "
+              f"settle {row['settling_time']:.2f} s, ITAE {row['ITAE']:.0f}")
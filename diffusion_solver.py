@@ -0,0 +1,187 @@
+import time
+import numpy as np
+from scipy.linalg import lapack
+
+# 1D Fick's second law solver for diffusion_simulation.ipynb.
+#
+# dC/dt = D d2C/dx2 on nx = int(L / dx) points with zero-flux boundaries
+# (C[0] = C[1], C[-1] = C[-2]).  Time stepping:
+#   explicit        - FTCS, one slice expression per step, stable only for
+#                     r = D*dt/dx**2 <= 0.5
+#   backward_euler  - implicit, stable and non-oscillating for any dt
+#   crank_nicolson  - implicit, second order in time, stable for any dt but
+#                     rings on sharp profiles when r is very large
+#   auto            - explicit when it is stable, backward Euler otherwise
+# The implicit modes factor their tridiagonal matrix once (LAPACK gttrf) and
+# do an O(nx) banded solve per step.  Only every snapshot_every-th step is
+# stored, so memory is O(nx * snapshots) instead of O(nx * nt).
+
+EXPLICIT_STABILITY_LIMIT = 0.5
+METHODS = ('auto', 'explicit', 'backward_euler', 'crank_nicolson')
+
+
+def stability_number(D, dx, dt):
+    """ r = D*dt/dx**2, the explicit scheme needs r <= 0.5 """
+    return D * dt / dx**2
+
+
+def fick_second_law(C0, D, L, dx, dt, total_time, snapshot_every=1, method='auto'):
+    """
+    Simulates diffusion using Fick's second law.
+
+    Parameters:
+    C0 (array): Initial concentration profile
+    D (float): Diffusion coefficient
+    L (float): Length of the domain
+    dx (float): Spatial step size
+    dt (float): Time step size
+    total_time (float): Total simulation time
+    snapshot_every (int): Keep every k-th time step (1 keeps them all)
+    method (str): 'auto', 'explicit', 'backward_euler' or 'crank_nicolson'
+
+    Returns:
+    C (2D array): Concentration profile at time steps 0, k, 2k, ... below int(total_time / dt)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid method '{method}'. Available methods are: {', '.join(METHODS)}")
+    nx = int(L / dx)
+    nt = int(total_time / dt)
+    r = stability_number(D, dx, dt)
+    if method == 'auto':
+        method = 'explicit' if r <= EXPLICIT_STABILITY_LIMIT else 'backward_euler'
+    if method == 'explicit' and r > EXPLICIT_STABILITY_LIMIT:
+        raise ValueError(f"Explicit scheme is unstable: D*dt/dx**2 = {r:.3g} > {EXPLICIT_STABILITY_LIMIT}. "
+                         f"Use dt <= {EXPLICIT_STABILITY_LIMIT * dx**2 / D:.3g} or an implicit method.")
+
+    C = np.empty((len(range(0, nt, snapshot_every)), nx))
+    current = np.array(C0, dtype=float)
+    C[0] = current
+    if method != 'explicit':
+        _implicit_steps(C, current, r, nt, snapshot_every, method)
+        return C
+
+    new = np.empty_like(current)
+    for t in range(1, nt):
+        # C_i + r (C_i+1 - 2 C_i + C_i-1), written to reuse the output buffer
+        interior = new[1:-1]
+        np.add(current[2:], current[:-2], out=interior)
+        interior *= r
+        interior += (1 - 2 * r) * current[1:-1]
+        # Boundary conditions (zero flux at boundaries)
+        new[0] = new[1]
+        new[-1] = new[-2]
+        current, new = new, current
+        if t % snapshot_every == 0:
+            C[t // snapshot_every] = current
+
+    return C
+
+
+def _implicit_steps(C, current, r, nt, snapshot_every, method):
+    """ Backward Euler / Crank-Nicolson steps, filling the snapshot rows of C """
+    nx = len(current)
+    # implicit weight: 1 for backward Euler, 1/2 for Crank-Nicolson
+    theta = 1.0 if method == 'backward_euler' else 0.5
+
+    # (I - theta r A) C_new = (I + (1 - theta) r A) C_old on the interior,
+    # boundary rows C[0] - C[1] = 0 and C[-1] - C[-2] = 0
+    lower = np.full(nx - 1, -theta * r)
+    diag = np.full(nx, 1 + 2 * theta * r)
+    upper = np.full(nx - 1, -theta * r)
+    diag[0] = diag[-1] = 1.0
+    upper[0] = -1.0
+    lower[-1] = -1.0
+    lower, diag, upper, upper2, pivots, info = lapack.dgttrf(lower, diag, upper)
+    if info != 0:
+        raise np.linalg.LinAlgError("Singular diffusion matrix")
+
+    explicit_r = (1 - theta) * r
+    rhs = np.empty(nx)
+    for t in range(1, nt):
+        if explicit_r:
+            interior = rhs[1:-1]
+            np.add(current[2:], current[:-2], out=interior)
+            interior *= explicit_r
+            interior += (1 - 2 * explicit_r) * current[1:-1]
+        else:
+            rhs[1:-1] = current[1:-1]
+        rhs[0] = rhs[-1] = 0.0
+        current, info = lapack.dgttrs(lower, diag, upper, upper2, pivots, rhs)
+        if t % snapshot_every == 0:
+            C[t // snapshot_every] = current
+
+
+def snapshot_times(dt, total_time, snapshot_every=1):
+    """ Times of the rows fick_second_law returns """
+    nt = int(total_time / dt)
+    return np.arange(0, nt, snapshot_every) * dt
+
+
+# Original notebook implementation, kept for the benchmark
+def legacy_fick_second_law(C0, D, L, dx, dt, total_time):
+    nx = int(L / dx)
+    nt = int(total_time / dt)
+    C = np.zeros((nt, nx))
+    C[0, :] = C0
+
+    for t in range(1, nt):
+        for x in range(1, nx - 1):
+            C[t, x] = C[t - 1, x] + D * dt / dx**2 * (C[t - 1, x + 1] - 2 * C[t - 1, x] + C[t - 1, x - 1])
+        C[t, 0] = C[t, 1]
+        C[t, -1] = C[t, -2]
+
+    return C
+
+
+def benchmark(grid_sizes=(100, 200, 400), D=1e-4, L=1.0, total_time=100.0, snapshots=10):
+    """ Seconds for the notebook loop vs the vectorized solver at each nx (dt at half the stability limit) """
+    results = []
+    for nx in grid_sizes:
+        dx = L / nx
+        dt = 0.25 * dx**2 / D
+        C0 = np.zeros(nx)
+        C0[nx // 2 - nx // 10:nx // 2 + nx // 10] = 1.0
+        nt = int(total_time / dt)
+
+        start = time.perf_counter()
+        reference = legacy_fick_second_law(C0, D, L, dx, dt, total_time)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        C = fick_second_law(C0, D, L, dx, dt, total_time, method='explicit')
+        vector_time = time.perf_counter() - start
+        if not np.allclose(C, reference):
+            raise RuntimeError(f"Results differ at nx={nx}")
+
+        every = max(1, nt // snapshots)
+        start = time.perf_counter()
+        C = fick_second_law(C0, D, L, dx, dt, total_time, snapshot_every=every, method='explicit')
+        snapshot_time = time.perf_counter() - start
+        results.append((nx, nt, legacy_time, vector_time, snapshot_time, reference.nbytes, C.nbytes))
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'nx':>6} {'nt':>7} {'loop s':>9} {'vector s':>9} {'snapshot s':>11} {'speedup':>8} "
+          f"{'history MB':>11} {'snapshots MB':>13}")
+    for nx, nt, legacy_time, vector_time, snapshot_time, full_bytes, snapshot_bytes in benchmark():
+        print(f"{nx:>6} {nt:>7} {legacy_time:>9.3f} {vector_time:>9.4f} {snapshot_time:>11.4f} "
+              f"{legacy_time / snapshot_time:>7.0f}x {full_bytes / 1e6:>11.2f} {snapshot_bytes / 1e6:>13.3f}")
+
+    # Long diffusion time in a handful of large implicit steps vs explicit at its limit
+    nx, D, L, total_time = 400, 1e-4, 1.0, 1000.0
+    dx = L / nx
+    C0 = np.zeros(nx)
+    C0[nx // 2 - nx // 10:nx // 2 + nx // 10] = 1.0
+    dt_explicit = EXPLICIT_STABILITY_LIMIT * dx**2 / D
+    start = time.perf_counter()
+    reference = fick_second_law(C0, D, L, dx, dt_explicit, total_time + dt_explicit, int(total_time / dt_explicit))
+    explicit_time = time.perf_counter() - start
+    for method in ('backward_euler', 'crank_nicolson'):
+        dt = total_time / 20
+        start = time.perf_counter()
+        C = fick_second_law(C0, D, L, dx, dt, total_time + dt, 20, method=method)
+        implicit_time = time.perf_counter() - start
+        print(f"{method}: 20 steps of r = {stability_number(D, dx, dt):.0f} in {implicit_time * 1000:.1f} ms "
+              f"(explicit: {int(total_time / dt_explicit)} steps in {explicit_time * 1000:.0f} ms), "
+              f"max difference {np.abs(C[-1] - reference[-1]).max():.4f}")
@@ -0,0 +1,225 @@
+import threading
+import time
+import numpy as np
+
+# Shared encoder edge detection for the motor control scripts.
+#
+# The scripts used to keep the last ARRAY_SIZE_ENCODER pin readings in a NumPy
+# array, rebuilt with np.insert/np.delete on every poll, and count an edge when
+# the window matched one of two fixed patterns.  EdgeDetector keeps the same
+# window as the bits of a single integer (a shift register), so every poll is a
+# shift, a mask and two integer compares - no allocation, O(1) in window size.
+
+
+class EdgeDetector:
+    __slots__ = ('size', 'mask', 'edge_high', 'edge_low', 'state', 'count')
+
+    def __init__(self, size=4, initial=0):
+        # Same window split as the original arrays:
+        # the newest (size - edge_size) readings against the oldest edge_size
+        edge_size = round(size / 2)
+        self.size = size
+        self.mask = (1 << size) - 1
+        # bit i holds the reading from i polls ago (bit 0 is the newest)
+        self.edge_high = ((1 << edge_size) - 1) << (size - edge_size)  # old 1s, new 0s
+        self.edge_low = (1 << (size - edge_size)) - 1                   # old 0s, new 1s
+        self.state = self.mask if initial else 0
+        self.count = 0
+
+    def update(self, value):
+        """ Shift in a new pin reading, returns 1 if it completed an edge, else 0 """
+        state = ((self.state << 1) | (value & 1)) & self.mask
+        self.state = state
+        if state == self.edge_high or state == self.edge_low:
+            self.count += 1
+            return 1
+        return 0
+
+    def reset(self, initial=0):
+        self.state = self.mask if initial else 0
+        self.count = 0
+
+
+# Counting backends.  Both expose poll(), returning the edges counted since the
+# previous call, so CounterFunction can do l_count += l_encoder.poll() either way.
+
+class PollingEncoder:
+    """ Reads the pin on every poll and debounces it with an EdgeDetector window """
+    __slots__ = ('gpio', 'pin', 'detector')
+    needs_polling = True
+
+    def __init__(self, gpio, pin, size=4, initial=0):
+        self.gpio = gpio
+        self.pin = pin
+        self.detector = EdgeDetector(size, initial)
+
+    @property
+    def count(self):
+        return self.detector.count
+
+    def poll(self):
+        return self.detector.update(self.gpio.input(self.pin))
+
+    def close(self):
+        pass
+
+
+class InterruptEncoder:
+    """ Counts edges in GPIO edge callbacks, debounced by the GPIO bouncetime (ms)
+
+    Only the callback thread writes count and only poll() writes taken, so the
+    control loop can read the counter without a lock.
+    """
+    __slots__ = ('gpio', 'pin', 'count', 'taken')
+    needs_polling = False
+
+    def __init__(self, gpio, pin, bouncetime=1, edge=None):
+        self.gpio = gpio
+        self.pin = pin
+        self.count = 0
+        self.taken = 0
+        gpio.add_event_detect(pin, gpio.BOTH if edge is None else edge,
+                              callback=self._on_edge, bouncetime=bouncetime)
+
+    def _on_edge(self, channel):
+        self.count += 1
+
+    def poll(self):
+        count = self.count
+        new_edges = count - self.taken
+        self.taken = count
+        return new_edges
+
+    def close(self):
+        self.gpio.remove_event_detect(self.pin)
+
+
+def make_encoder(gpio, pin, mode='poll', size=4, initial=0, bouncetime=1):
+    """ 'poll' keeps the debounce-window behaviour, 'interrupt' uses edge callbacks """
+    if mode == 'poll':
+        return PollingEncoder(gpio, pin, size, initial)
+    elif mode == 'interrupt':
+        return InterruptEncoder(gpio, pin, bouncetime)
+    else:
+        raise ValueError(f"Invalid encoder mode '{mode}'. Use 'poll' or 'interrupt'.")
+
+
+# Original array based detector, kept for the benchmark and as a reference
+def legacy_edge_counter(size=4, initial=0):
+    edge_size = round(size / 2)
+    array_edge_high = np.full(size, 1)
+    array_edge_high[:-edge_size] = 0
+    array_edge_low = np.full(size, 0)
+    array_edge_low[:-edge_size] = 1
+    array = np.full(size, initial)
+
+    def update(value):
+        nonlocal array
+        array = np.insert(array, 0, value)
+        array = np.delete(array, -1)
+        if (array == array_edge_high).all() or (array == array_edge_low).all():
+            return 1
+        return 0
+
+    return update
+
+
+def square_wave(num_samples, samples_per_level=25):
+    """ Pin readings of an ideal encoder disc, samples_per_level polls per slot """
+    return ((np.arange(num_samples) // samples_per_level) % 2).astype(int).tolist()
+
+
+def benchmark(num_polls=200000, size=20):
+    """ Polls/second of the array based counter vs the shift register, two wheels per poll """
+    readings = square_wave(num_polls)
+
+    legacy_l = legacy_edge_counter(size)
+    legacy_r = legacy_edge_counter(size)
+    start = time.perf_counter()
+    legacy_count = 0
+    for value in readings:
+        legacy_count += legacy_l(value)
+        legacy_r(value)
+    legacy_time = time.perf_counter() - start
+
+    detector_l = EdgeDetector(size)
+    detector_r = EdgeDetector(size)
+    start = time.perf_counter()
+    for value in readings:
+        detector_l.update(value)
+        detector_r.update(value)
+    detector_time = time.perf_counter() - start
+
+    if legacy_count != detector_l.count:
+        raise RuntimeError(f"Edge counts differ: {legacy_count} vs {detector_l.count}")
+
+    return num_polls / legacy_time, num_polls / detector_time, detector_l.count
+
+
+def benchmark_backends(mode, duration=2.0, edge_rate=400, sample_time=0.1, size=4):
+    """ Run a SAMPLE_TIME control loop against a fake encoder toggling at edge_rate edges/s
+
+    Returns (edges generated, edges counted, control loop CPU seconds per wall second,
+    worst lateness of a sample in seconds).  The driver thread shares the GIL with
+    the control loop, so a busy-waiting loop also starves the simulated encoder.
+    """
+    import fake_gpio
+
+    fake_gpio.cleanup()
+    fake_gpio.setmode(fake_gpio.BOARD)
+    fake_gpio.setup(5, fake_gpio.IN)
+    encoder = make_encoder(fake_gpio, 5, mode, size)
+
+    stop = threading.Event()
+    generated = 0
+
+    def drive():
+        nonlocal generated
+        level = 0
+        t0 = time.perf_counter()
+        while not stop.is_set():
+            time.sleep(0.25 / edge_rate)
+            new_level = int((time.perf_counter() - t0) * edge_rate) % 2
+            if new_level != level:
+                level = new_level
+                fake_gpio.set_input(5, level)
+                generated += 1
+
+    driver = threading.Thread(target=drive, daemon=True)
+    driver.start()
+
+    counted = 0
+    worst_late = 0.0
+    cpu_start = time.thread_time()
+    t_start = time.perf_counter()
+    t_sample = sample_time
+    t = 0
+    while t < duration:
+        t = time.perf_counter() - t_start
+        counted += encoder.poll()
+        if t >= t_sample:
+            worst_late = max(worst_late, t - t_sample)
+            t_sample += sample_time
+        if not encoder.needs_polling:
+            time.sleep(max(0.0, t_sample - t))
+    cpu = time.thread_time() - cpu_start
+
+    stop.set()
+    driver.join()
+    counted += encoder.poll()
+    encoder.close()
+    fake_gpio.cleanup()
+    return generated, counted, cpu / duration, worst_late
+
+
+if __name__ == "__main__":
+    for size in (4, 20):
+        before, after, edges = benchmark(size=size)
+        print(f"ARRAY_SIZE_ENCODER={size}: {edges} edges")
+        print(f"  np.insert/np.delete: {before:,.0f} polls/s")
+        print(f"  shift register:      {after:,.0f} polls/s ({after / before:.1f}x)")
+
+    for mode in ('poll', 'interrupt'):
+        generated, counted, cpu, late = benchmark_backends(mode)
+        print(f"{mode:>9}: counted {counted}/{generated} edges, "
+              f"control loop CPU {cpu * 100:.0f}%, worst sample lateness {late * 1000:.2f} ms")
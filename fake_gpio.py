@@ -0,0 +1,156 @@
+import time
+
+# Stand-in for RPi.GPIO so the motor control code can run, be tested and be
+# benchmarked off the Pi.  It implements the subset of the RPi.GPIO API the
+# scripts use (import fake_gpio as GPIO) plus a few helpers to drive inputs.
+#
+# Inputs are driven with set_input(); a level change fires any edge callbacks
+# registered with add_event_detect, honouring bouncetime like RPi.GPIO does.
+# Callbacks run synchronously in the thread calling set_input().
+
+BOARD = 10
+BCM = 11
+IN = 1
+OUT = 0
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+# Time source (seconds) used for bouncetime and the PWM log, replaceable for
+# simulated time
+clock = time.monotonic
+
+mode = None
+_directions = {}
+_levels = {}
+_events = {}
+
+# Every duty cycle change as (time, pin, duty_cycle)
+pwm_log = []
+
+
+def setmode(new_mode):
+    global mode
+    mode = new_mode
+
+
+def setwarnings(flag):
+    pass
+
+
+def setup(pin, direction, pull_up_down=PUD_OFF, initial=LOW):
+    _directions[pin] = direction
+    if direction == IN:
+        _levels.setdefault(pin, HIGH if pull_up_down == PUD_UP else LOW)
+    else:
+        _levels[pin] = initial
+
+
+def input(pin):
+    return _levels.get(pin, LOW)
+
+
+def output(pin, value):
+    _levels[pin] = 1 if value else 0
+
+
+def cleanup(pin=None):
+    global mode
+    if pin is None:
+        _directions.clear()
+        _levels.clear()
+        _events.clear()
+        mode = None
+    else:
+        _directions.pop(pin, None)
+        _levels.pop(pin, None)
+        _events.pop(pin, None)
+
+
+class _Event:
+    __slots__ = ('edge', 'callbacks', 'bouncetime', 'last_time', 'detected')
+
+    def __init__(self, edge, bouncetime):
+        self.edge = edge
+        self.callbacks = []
+        self.bouncetime = (bouncetime or 0) / 1000  # ms, as in RPi.GPIO
+        self.last_time = None
+        self.detected = False
+
+
+def add_event_detect(pin, edge, callback=None, bouncetime=None):
+    if pin in _events:
+        raise RuntimeError(f"Conflicting edge detection already enabled for pin {pin}")
+    _events[pin] = _Event(edge, bouncetime)
+    if callback is not None:
+        _events[pin].callbacks.append(callback)
+
+
+def add_event_callback(pin, callback):
+    if pin not in _events:
+        raise RuntimeError(f"Add event detection using add_event_detect first for pin {pin}")
+    _events[pin].callbacks.append(callback)
+
+
+def remove_event_detect(pin):
+    _events.pop(pin, None)
+
+
+def event_detected(pin):
+    event = _events.get(pin)
+    if event is None or not event.detected:
+        return False
+    event.detected = False
+    return True
+
+
+def set_input(pin, level, now=None):
+    """ Drive an input pin, firing edge callbacks on a level change """
+    level = 1 if level else 0
+    previous = _levels.get(pin, LOW)
+    _levels[pin] = level
+    if level == previous:
+        return
+    event = _events.get(pin)
+    if event is None:
+        return
+    if event.edge == RISING and not level or event.edge == FALLING and level:
+        return
+    if now is None:
+        now = clock()
+    if event.last_time is not None and now - event.last_time < event.bouncetime:
+        return
+    event.last_time = now
+    event.detected = True
+    for callback in event.callbacks:
+        callback(pin)
+
+
+class PWM:
+    def __init__(self, pin, frequency):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        if not 0 <= duty_cycle <= 100:
+            raise ValueError("dutycycle must have a value from 0.0 to 100.0")
+        self.duty_cycle = duty_cycle
+        pwm_log.append((clock(), self.pin, duty_cycle))
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+        pwm_log.append((clock(), self.pin, 0))
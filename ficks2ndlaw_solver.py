@@ -1,9 +1,17 @@
+import functools
+import itertools
 import numpy as np
-from scipy.special import erf
+from scipy.special import erf, erfinv
 import matplotlib.pyplot as plt
 
+# Size of each unit in SI (seconds, meters, ...)
+CONVERSION_FACTORS = {
+    'm^2/s': 1, 'mol/m^3': 1, 'seconds': 1, 'minutes': 60, 'hours': 3600,
+    'meters': 1, 'centimeters': 0.01, 'millimeters': 0.001
+}
+
 def convert_units(value, from_unit, to_unit, conversion_factors):
-    return value * conversion_factors[to_unit] / conversion_factors[from_unit]
+    return value * conversion_factors[from_unit] / conversion_factors[to_unit]
 
 def get_input(prompt, valid_units):
     value = float(input(f"{prompt}: "))
@@ -15,17 +23,104 @@ def get_input(prompt, valid_units):
 def calculate_average_atomic_density(concentration, molar_volume):
     return concentration / molar_volume
 
-def plot_concentration_gradient(D, C0, Cs, t, x_range, y_range):
-    x = np.linspace(x_range[0], x_range[1], 100)
-    y = np.linspace(y_range[0], y_range[1], 100)
+def plot_concentration_gradient(D, C0, Cs, t, x_range, y_range, resolution=100, progressive=False):
+    if progressive:
+        # coarse previews first, each finer grid replaces the last
+        for x, y, Z in progressive_fields(D, C0, Cs, t, x_range, y_range, resolution):
+            if Z.shape[0] == resolution:
+                break
+            plt.clf()
+            plt.contourf(x, y, Z, levels=100, cmap='viridis')
+            plt.pause(0.001)
+        plt.clf()
+    x, y, Z = concentration_field(D, C0, Cs, t, x_range, y_range, resolution)
     X, Y = np.meshgrid(x, y)
-    Z = C0 + (Cs - C0) * erf(np.sqrt(X**2 + Y**2) / (2 * np.sqrt(D * t)))
 
+    plot_concentration_field(X, Y, Z)
+
+# Field evaluation for the plots.  C depends on (x, y) only through
+# r = sqrt(x^2 + y^2), so each grid is reduced once to its unique radii and
+# an index map (cached per extent and resolution); a field is then one erf
+# per unique radius gathered back onto the grid, and evaluated fields are
+# kept in an LRU cache.  Cached arrays are read-only.
+FIELD_CACHE_SIZE = 32
+
+@functools.lru_cache(maxsize=8)
+def _radius_table(x_range, y_range, resolution):
+    x = np.linspace(x_range[0], x_range[1], resolution)
+    y = np.linspace(y_range[0], y_range[1], resolution)
+    # x^2 + y^2 is bit-identical under sign flips and swapping x and y, so
+    # mirrored points share one radius
+    r2 = x[None, :]**2 + y[:, None]**2
+    r2_unique, index = np.unique(r2, return_inverse=True)
+    return x, y, np.sqrt(r2_unique), index.reshape(r2.shape)
+
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _cached_field(D, C0, Cs, t, x_range, y_range, resolution):
+    x, y, radii, index = _radius_table(x_range, y_range, resolution)
+    Z = (C0 + (Cs - C0) * erf(radii / (2 * np.sqrt(D * t))))[index]
+    Z.flags.writeable = False
+    return x, y, Z
+
+def concentration_field(D, C0, Cs, t, x_range, y_range, resolution=100):
+    # (x, y, Z) with Z[j, i] the concentration at (x[i], y[j]), as with meshgrid
+    return _cached_field(float(D), float(C0), float(Cs), float(t), (float(x_range[0]), float(x_range[1])),
+                         (float(y_range[0]), float(y_range[1])), int(resolution))
+
+def clear_field_cache():
+    _cached_field.cache_clear()
+    _radius_table.cache_clear()
+
+def progressive_fields(D, C0, Cs, t, x_range, y_range, resolution=100, start=25):
+    # Fields at start, 2*start, ... resolution points per axis, coarse to fine
+    level = start
+    while level < resolution:
+        yield concentration_field(D, C0, Cs, t, x_range, y_range, level)
+        level *= 2
+    yield concentration_field(D, C0, Cs, t, x_range, y_range, resolution)
+
+def time_lapse_fields(D, C0, Cs, times, x_range, y_range, resolution=100):
+    # (t, Z) for every t, sharing one radius table; erf is vectorized over all
+    # times at once on the unique radii only
+    x, y, radii, index = _radius_table((float(x_range[0]), float(x_range[1])),
+                                       (float(y_range[0]), float(y_range[1])), int(resolution))
+    times = np.atleast_1d(np.asarray(times, dtype=float))
+    profiles = C0 + (Cs - C0) * erf(radii[None, :] / (2 * np.sqrt(D * times))[:, None])
+    for t, profile in zip(times, profiles):
+        yield t, profile[index]
+
+def animate_concentration(D, C0, Cs, times, x_range, y_range, resolution=100, path=None, interval=100):
+    # Time-lapse of the field over `times`; saved to path (e.g. .gif) or shown
+    from matplotlib.animation import FuncAnimation
+    frames = list(time_lapse_fields(D, C0, Cs, times, x_range, y_range, resolution))
+    fig, ax = plt.subplots()
+    extent = (x_range[0], x_range[1], y_range[0], y_range[1])
+    image = ax.imshow(frames[0][1], origin='lower', extent=extent, aspect='auto', cmap='viridis',
+                      vmin=min(C0, Cs), vmax=max(C0, Cs))
+    fig.colorbar(image, label='Concentration (mol/m^3)')
+    ax.set_xlabel('X (meters)')
+    ax.set_ylabel('Y (meters)')
+
+    def draw(i):
+        t, Z = frames[i]
+        image.set_data(Z)
+        ax.set_title(f'Concentration Gradient, t = {t:.4g} s')
+        return image,
+
+    animation = FuncAnimation(fig, draw, frames=len(frames), interval=interval)
+    if path:
+        animation.save(path)
+        plt.close(fig)
+    else:
+        plt.show()
+    return animation
+
+def plot_concentration_field(X, Y, Z, title='Concentration Gradient'):
     plt.contourf(X, Y, Z, levels=100, cmap='viridis')
     plt.colorbar(label='Concentration (mol/m^3)')
     plt.xlabel('X (meters)')
     plt.ylabel('Y (meters)')
-    plt.title('Concentration Gradient')
+    plt.title(title)
     plt.show()
 
 def fick_second_law_2d(D, C0, Cs, t, x, y):
@@ -43,44 +138,122 @@ def solve_for_variable(variable, conversion_factors, params):
     y = convert_units(y, 'meters', 'meters', conversion_factors)
     D = convert_units(D, 'm^2/s', 'm^2/s', conversion_factors)
 
-    if variable == 'd':
-        r = np.sqrt(x**2 + y**2)
-        D = (r / (2 * np.sqrt(t * erf((C - Cs) / (C0 - Cs)))))**2
-        return D, 'm^2/s'
-    elif variable == 'c':
-        C = fick_second_law_2d(D, C0, Cs, t, x, y)
-        return C, 'mol/m^3'
-    elif variable == 'c0':
-        r = np.sqrt(x**2 + y**2)
-        C0 = C - (C - Cs) / erf(r / (2 * np.sqrt(D * t)))
-        return C0, 'mol/m^3'
-    elif variable == 'cs':
-        r = np.sqrt(x**2 + y**2)
-        Cs = C - (C0 - Cs) * erf(r / (2 * np.sqrt(D * t)))
-        return Cs, 'mol/m^3'
-    elif variable == 't':
-        r = np.sqrt(x**2 + y**2)
-        t = (r / (2 * np.sqrt(D * erf((C - Cs) / (C0 - Cs)))))**2
-        return t, 'seconds'
-    elif variable == 'x' or variable == 'y':
-        if variable == 'x':
-            y = convert_units(y, 'meters', 'meters', conversion_factors)
-            r = 2 * np.sqrt(D * t) * erf((C - Cs) / (C0 - Cs))
-            x = np.sqrt(r**2 - y**2)
-            return x, 'meters'
-        else:
-            x = convert_units(x, 'meters', 'meters', conversion_factors)
-            r = 2 * np.sqrt(D * t) * erf((C - Cs) / (C0 - Cs))
-            y = np.sqrt(r**2 - x**2)
-            return y, 'meters'
-    else:
+    if variable not in VARIABLES:
         raise ValueError("Invalid variable to solve for.")
+    result, unit = solve_array(variable, C=C, C0=C0, Cs=Cs, t=t, x=x, y=y, D=D)
+    return float(result), unit
+
+# Batch mode: every input may be a scalar or an array, they broadcast
+# together.  The model is C = C0 + (Cs - C0) erf(z), z = r / (2 sqrt(D t)),
+# so the inversions go through z = erfinv((C - C0) / (Cs - C0)).  Inputs
+# with no solution (ratio outside [0, 1), r < |y| for x) give NaN.
+VARIABLES = ('d', 'c', 'c0', 'cs', 't', 'x', 'y')
+RESULT_UNITS = {'d': 'm^2/s', 'c': 'mol/m^3', 'c0': 'mol/m^3', 'cs': 'mol/m^3',
+                't': 'seconds', 'x': 'meters', 'y': 'meters'}
+# Column name and SI unit of each variable in batch files
+COLUMN_NAMES = {'c': 'C', 'c0': 'C0', 'cs': 'Cs', 't': 't', 'x': 'x', 'y': 'y', 'd': 'D'}
+INPUT_UNITS = {'c': 'mol/m^3', 'c0': 'mol/m^3', 'cs': 'mol/m^3', 't': 'seconds',
+               'x': 'meters', 'y': 'meters', 'd': 'm^2/s'}
+
+def solve_array(variable, C=None, C0=None, Cs=None, t=None, x=None, y=None, D=None):
+    variable = variable.lower()
+    if variable not in VARIABLES:
+        raise ValueError(f"Invalid variable to solve for. Choose one of: {', '.join(VARIABLES)}")
+    values = {'c': C, 'c0': C0, 'cs': Cs, 't': t, 'x': x, 'y': y, 'd': D}
+    missing = [COLUMN_NAMES[name] for name, value in values.items() if value is None and name != variable]
+    if missing:
+        raise ValueError(f"Missing inputs to solve for {COLUMN_NAMES[variable]}: {', '.join(missing)}")
+    C, C0, Cs, t, x, y, D = (None if v is None else np.asarray(v, dtype=float) for v in values.values())
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if variable == 'c':
+            result = fick_second_law_2d(D, C0, Cs, t, x, y)
+        elif variable in ('c0', 'cs'):
+            e = erf(np.sqrt(x**2 + y**2) / (2 * np.sqrt(D * t)))
+            # C = C0 (1 - e) + Cs e
+            result = (C - Cs * e) / (1 - e) if variable == 'c0' else C0 + (C - C0) / e
+        else:
+            z = erfinv((C - C0) / (Cs - C0))
+            z = np.where(z >= 0, z, np.nan)
+            if variable in ('d', 't'):
+                # r / (2 z) = sqrt(D t)
+                r = np.sqrt(x**2 + y**2)
+                result = (r / (2 * z))**2 / (t if variable == 'd' else D)
+            else:
+                r = 2 * z * np.sqrt(D * t)
+                other = y if variable == 'x' else x
+                result = np.sqrt(r**2 - other**2)
+    return result, RESULT_UNITS[variable]
+
+def to_si(columns, units=None, conversion_factors=CONVERSION_FACTORS):
+    # {name: values} in the given units ({'t': 'hours', ...}) -> {variable: SI values}
+    units = {name.lower(): unit for name, unit in (units or {}).items()}
+    si = {}
+    for name, values in columns.items():
+        name = name.lower()
+        if name in INPUT_UNITS and values is not None:
+            si[name] = convert_units(np.asarray(values, dtype=float), units.get(name, INPUT_UNITS[name]),
+                                     INPUT_UNITS[name], conversion_factors)
+    return si
+
+def solve_columns(variable, columns, units=None, conversion_factors=CONVERSION_FACTORS, **constants):
+    # columns and constants are {name: values}, e.g. solve_columns('d', data, Cs=1.2, C0=0.2)
+    inputs = to_si({**constants, **columns}, units, conversion_factors)
+    inputs.pop(variable.lower(), None)
+    return solve_array(variable, **{COLUMN_NAMES[name]: values for name, values in inputs.items()})
+
+def read_chunks(path, chunk_size=65536):
+    # {column: array} blocks of a CSV (header line, numeric rows) or Parquet file
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq  # optional, only needed for Parquet
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield {name: batch.column(i).to_numpy(zero_copy_only=False).astype(float)
+                   for i, name in enumerate(batch.schema.names)}
+        return
+    with open(path) as f:
+        names = [name.strip() for name in f.readline().split(',')]
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                break
+            data = np.loadtxt(lines, delimiter=',', ndmin=2)
+            yield {name: data[:, i] for i, name in enumerate(names)}
+
+def solve_file(variable, path, output, chunk_size=65536, units=None,
+               conversion_factors=CONVERSION_FACTORS, **constants):
+    # Solve every row of a CSV/Parquet file, writing the input columns plus the
+    # result column to output (CSV, or Parquet by extension) one chunk at a time.
+    # Returns the number of rows written.
+    variable = variable.lower()
+    result_name = COLUMN_NAMES[variable]
+    rows = 0
+    writer = None
+    try:
+        for columns in read_chunks(path, chunk_size):
+            result, unit = solve_columns(variable, columns, units, conversion_factors, **constants)
+            n = len(next(iter(columns.values())))
+            out = {name: values for name, values in columns.items() if name != result_name}
+            out[f'{result_name} ({unit})'] = np.broadcast_to(result, (n,))
+            if output.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.table(out)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, table.schema)
+                writer.write_table(table)
+            else:
+                if writer is None:
+                    writer = open(output, 'w')
+                    writer.write(','.join(out) + '\n')
+                np.savetxt(writer, np.column_stack(list(out.values())), delimiter=',', fmt='%.10g')
+            rows += n
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
 
 def main():
-    conversion_factors = {
-        'm^2/s': 1, 'mol/m^3': 1, 'seconds': 1, 'minutes': 60, 'hours': 3600,
-        'meters': 1, 'centimeters': 0.01, 'millimeters': 0.001
-    }
+    conversion_factors = CONVERSION_FACTORS
 
     variable = input("Which variable would you like to solve for (D, C, C0, Cs, t, x, y)? ").strip().lower()
     
@@ -0,0 +1,127 @@
+import math
+import time
+import decimal
+import numpy as np
+
+# RPM filter stage for the control loop.  Every filter has update(x, dt) -> y
+# and reset(); each update is O(1) arithmetic on plain Python floats (no
+# numpy scalars are created per tick), so the window length does not change
+# the per-tick cost.
+
+
+class MovingAverage:
+    """ Mean of the last `window` samples (zeros before the buffer has filled,
+    like the original np.full(20, 0) RPM arrays) """
+    __slots__ = ('window', 'buffer', 'index', 'total', 'updates')
+
+    # the running sum is recomputed from the buffer this often to stop
+    # floating point error from accumulating
+    RESUM_EVERY = 4096
+
+    def __init__(self, window=20):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        # a list, not an ndarray: indexing an ndarray creates a numpy scalar
+        self.buffer = [0.0] * self.window
+        self.index = 0
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, x, dt=None):
+        index = self.index
+        self.total += x - self.buffer[index]
+        self.buffer[index] = x
+        index += 1
+        self.index = 0 if index == self.window else index
+        self.updates += 1
+        if self.updates % self.RESUM_EVERY == 0:
+            self.total = math.fsum(self.buffer)
+        return self.total / self.window
+
+
+class ExponentialMovingAverage:
+    """ y += alpha * (x - y), with alpha = 2 / (window + 1) unless given """
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, window=20, alpha=None):
+        self.alpha = 2 / (window + 1) if alpha is None else alpha
+        self.reset()
+
+    def reset(self):
+        self.value = 0.0
+
+    def update(self, x, dt=None):
+        self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class LowPass:
+    """ First-order low-pass with time constant tau (seconds), exact for the
+    actual dt between samples """
+    __slots__ = ('tau', 'value')
+
+    def __init__(self, tau=1.0):
+        self.tau = tau
+        self.reset()
+
+    def reset(self):
+        self.value = 0.0
+
+    def update(self, x, dt):
+        self.value += (1 - math.exp(-dt / self.tau)) * (x - self.value)
+        return self.value
+
+
+def make_filter(kind='moving_average', window=20, sample_time=0.1):
+    """ 'moving_average', 'ema' or 'lowpass'; for the low-pass, window samples
+    of sample_time give the time constant """
+    if kind == 'moving_average':
+        return MovingAverage(window)
+    elif kind == 'ema':
+        return ExponentialMovingAverage(window)
+    elif kind == 'lowpass':
+        return LowPass(window * sample_time)
+    else:
+        raise ValueError(f"Invalid filter '{kind}'. Use 'moving_average', 'ema' or 'lowpass'.")
+
+
+# Original Decimal-dtype object array filter, kept for the benchmark
+def legacy_rpm_filter(window=20):
+    history = np.full(window, 0, dtype=decimal.Decimal)
+
+    def update(x, dt=None):
+        nonlocal history
+        history = np.insert(history, 0, x)
+        history = np.delete(history, -1)
+        return np.mean(history)
+
+    return update
+
+
+def benchmark(windows=(5, 20, 100, 1000, 10000), ticks=20000):
+    """ Microseconds per update for each filter at each window size """
+    samples = np.random.default_rng(0).uniform(0, 120, ticks).tolist()
+    results = {}
+    for window in windows:
+        row = {}
+        for name, rpm_filter in (('legacy', legacy_rpm_filter(window)),
+                                 ('moving_average', MovingAverage(window).update),
+                                 ('ema', ExponentialMovingAverage(window).update),
+                                 ('lowpass', LowPass(window * 0.1).update)):
+            n = ticks if name != 'legacy' else min(ticks, 2000)
+            start = time.perf_counter()
+            for x in samples[:n]:
+                rpm_filter(x, 0.1)
+            row[name] = (time.perf_counter() - start) / n * 1e6
+        results[window] = row
+    return results
+
+
+if __name__ == "__main__":
+    results = benchmark()
+    names = list(next(iter(results.values())))
+    print('window ' + ''.join(f'{name:>16}' for name in names) + '   (us per update)')
+    for window, row in results.items():
+        print(f'{window:>6} ' + ''.join(f'{row[name]:>16.2f}' for name in names))
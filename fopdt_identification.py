@@ -0,0 +1,174 @@
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tuning_rules
+
+# Batch FOPDT identification from step-test CSVs (Step_Data_Collection_v6.py
+# output) and the PI/PID gains the tuning scripts compute from K, tau, theta.
+#
+# Model of one wheel after a power step du at t_step:
+#   rpm(t) = rpm0 + K * du * (1 - exp(-(t - t_step - theta) / tau))  for t > t_step + theta
+# For fixed (theta, tau) the response is linear in K, so K has a closed form
+# least squares solution and the residual of every (theta, tau) pair on a grid
+# is evaluated in one broadcast NumPy pass, then refined on a finer grid.
+
+# Column names each wheel's RPM and power can appear under in the scripts' CSVs
+WHEEL_COLUMNS = {
+    'l': ('l_RPM', ('power_l', 'input_power_l', 'l_power', 'input_power')),
+    'r': ('r_RPM', ('power_r', 'input_power_r', 'r_pwr', 'input_power')),
+}
+# Rows older step files actually contain (their header line listed other columns)
+LEGACY_STEP_COLUMNS = ['time', 'l_RPM', 'r_RPM', 'trial', 'input_power']
+
+RULES = {
+    'ZN_PI': lambda K, tau, theta: tuning_rules.zn_open_loop(K, tau, theta, 'PI'),
+    'ZN_PID': lambda K, tau, theta: tuning_rules.zn_open_loop(K, tau, theta, 'PID'),
+    'IMC_PI': tuning_rules.imc_pi,
+    'IMC_PID': tuning_rules.imc_pid,
+    'ITAE_PI': tuning_rules.itae_pi,
+    'ITAE_PID': tuning_rules.itae_pid,
+}
+
+
+def load_step_csv(path):
+    """ Read a step test CSV into {column name: float array} """
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    start = 0
+    # skip the 'Encoder Data' style title line
+    if not lines[0].split(',')[0].replace('.', '', 1).isdigit() and \
+            not lines[1].split(',')[0].replace('.', '', 1).isdigit():
+        start = 1
+    header = [name.strip() for name in lines[start].split(',')]
+    data = np.array([[float(v) for v in line.split(',')] for line in lines[start + 1:]])
+    if data.shape[1] != len(header):
+        if data.shape[1] == len(LEGACY_STEP_COLUMNS):
+            header = LEGACY_STEP_COLUMNS
+        else:
+            raise ValueError(f"{path}: {len(header)} header columns but {data.shape[1]} data columns")
+    return {name: data[:, i] for i, name in enumerate(header)}
+
+
+def _grid_fit(t, dy, thetas, taus):
+    """ Best (theta, tau, amplitude, sse) over the grid, all pairs at once """
+    lag = t[None, None, :] - thetas[:, None, None]
+    g = -np.expm1(-np.maximum(lag, 0.0) / taus[None, :, None])   # (n_theta, n_tau, n)
+    gy = g @ dy
+    gg = np.einsum('ijk,ijk->ij', g, g)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sse = dy @ dy - np.where(gg > 0, gy * gy / gg, 0.0)
+    i, j = np.unravel_index(np.argmin(sse), sse.shape)
+    amplitude = gy[i, j] / gg[i, j] if gg[i, j] > 0 else 0.0
+    return thetas[i], taus[j], amplitude, sse[i, j]
+
+
+def fit_fopdt(t, rpm, power, n_theta=61, n_tau=80, max_theta=3.0):
+    """ Fit K, tau, theta to one wheel's response to the largest power step
+
+    Returns a dict with K, tau, theta, rmse, the step time and size.
+    """
+    t = np.asarray(t, dtype=float)
+    rpm = np.asarray(rpm, dtype=float)
+    power = np.asarray(power, dtype=float)
+
+    changes = np.flatnonzero(np.diff(power)) + 1
+    if len(changes):
+        step = changes[np.argmax(np.abs(power[changes] - power[changes - 1]))]
+        u0, u1 = power[step - 1], power[step]
+        end = changes[changes > step][0] if np.any(changes > step) else len(t)
+        # steady state before the step: the last second of samples
+        before = (t >= t[step] - 1.0) & (np.arange(len(t)) < step)
+        y0 = rpm[before].mean() if before.any() else rpm[step - 1]
+    else:
+        # a single level: the step from rest at t = 0
+        step, u0, u1, end, y0 = 0, 0.0, power[0], len(t), 0.0
+    if u1 == u0:
+        raise ValueError("No power step in the data")
+
+    t_rel = t[step:end] - t[step]
+    dy = rpm[step:end] - y0
+    span = max(t_rel[-1], 1e-6)
+
+    thetas = np.linspace(0, min(max_theta, span / 2), n_theta)
+    taus = np.geomspace(0.02, 2 * span, n_tau)
+    theta, tau, amplitude, sse = _grid_fit(t_rel, dy, thetas, taus)
+
+    # refine around the coarse optimum
+    d_theta = thetas[1] - thetas[0] if n_theta > 1 else 0.0
+    thetas = np.linspace(max(0.0, theta - d_theta), theta + d_theta, n_theta)
+    ratio = (taus[1] / taus[0]) if n_tau > 1 else 1.0
+    taus = np.geomspace(tau / ratio, tau * ratio, n_tau)
+    theta, tau, amplitude, sse = _grid_fit(t_rel, dy, thetas, taus)
+
+    return {'K': amplitude / (u1 - u0), 'tau': tau, 'theta': theta,
+            'rmse': float(np.sqrt(max(sse, 0.0) / len(dy))),
+            't_step': float(t[step]), 'u0': float(u0), 'u1': float(u1)}
+
+
+def controller_gains(K, tau, theta):
+    """ {rule: (Kc, TI, TD)} for every rule in RULES """
+    gains = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, rule in RULES.items():
+            # NumPy scalars so a zero dead time gives inf gains instead of raising
+            gains[name] = tuple(float(g) for g in rule(np.float64(K), np.float64(tau), np.float64(theta)))
+    return gains
+
+
+def identify_file(path):
+    """ Fit both wheels of one step CSV, returns a list of result rows """
+    columns = load_step_csv(path)
+    rows = []
+    for wheel, (rpm_name, power_names) in WHEEL_COLUMNS.items():
+        if rpm_name not in columns:
+            continue
+        power_name = next(name for name in power_names if name in columns)
+        fit = fit_fopdt(columns['time'], columns[rpm_name], columns[power_name])
+        row = {'file': os.path.basename(path), 'wheel': wheel, **fit}
+        for rule, (Kc, TI, TD) in controller_gains(fit['K'], fit['tau'], fit['theta']).items():
+            row[f'{rule}_Kc'] = Kc
+            row[f'{rule}_TI'] = TI
+            row[f'{rule}_TD'] = TD
+        rows.append(row)
+    return rows
+
+
+def identify_files(paths, workers=None):
+    """ Identify every file, in parallel across processes when there are several """
+    if len(paths) == 1 or workers == 1:
+        results = [identify_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(identify_file, paths))
+    return [row for rows in results for row in rows]
+
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit FOPDT models to step test CSVs and compute PI/PID gains")
+    parser.add_argument('files', nargs='+', help="step test CSV files")
+    parser.add_argument('-o', '--output', default='fopdt_gains.csv', help="results CSV")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes")
+    args = parser.parse_args()
+
+    rows = identify_files(args.files, args.workers)
+    for row in rows:
+        print(f"{row['file']} ({row['wheel']}): K = {row['K']:.3f}, tau = {row['tau']:.3f} s, "
+              f"theta = {row['theta']:.3f} s, rmse = {row['rmse']:.2f} RPM")
+        print(f"    ITAE PID: Kc = {row['ITAE_PID_Kc']:.3f}, TI = {row['ITAE_PID_TI']:.3f}, "
+              f"TD = {row['ITAE_PID_TD']:.3f}")
+    write_results(rows, args.output)
+    print(f"Results saved to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
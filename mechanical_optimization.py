@@ -1,3 +1,9 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import random
 import matplotlib.pyplot as plt
@@ -34,6 +40,20 @@ def beam_deflection(length, width, height):
     deflection = (5 * applied_load * length**3) / (384 * E * I)  # Deflection in cm
     return deflection
 
+# Analytic gradients [d/dlength, d/dwidth, d/dheight] for the gradient based optimizer
+def beam_weight_gradient(length, width, height):
+    return material_density * np.array([width * height, length * height, length * width])
+
+def beam_bending_stress_gradient(length, width, height):
+    """ stress is proportional to length / (width * height^2) """
+    stress = beam_bending_stress(length, width, height)
+    return stress * np.array([1 / length, -1 / width, -2 / height])
+
+def beam_deflection_gradient(length, width, height):
+    """ deflection is proportional to length^3 / (width * height^3) """
+    deflection = beam_deflection(length, width, height)
+    return deflection * np.array([3 / length, -1 / width, -3 / height])
+
 def fitness_function(individual):
     """ Fitness function for genetic algorithm: Minimize weight, subject to constraints on stress and deflection """
     length, width, height = individual
@@ -86,10 +106,62 @@ def selection(population, fitness_values):
         selected_parents.append(tournament[0][0])
     return selected_parents
 
+# Convergence control shared by the GA versions: elitism, adaptive mutation,
+# stagnation early stopping and time / evaluation budgets.  The mutation rate
+# shrinks while the best fitness improves (fine tuning around a good design)
+# and grows while it stalls (to escape a penalty-dominated basin).
+class Convergence:
+    def __init__(self, elitism=2, min_mutation_rate=0.01, max_mutation_rate=0.5,
+                 adapt=1.5, patience=30, tol=1e-6, time_limit=None, max_evaluations=None):
+        self.elitism = elitism                  # best individuals copied unchanged into the next generation
+        self.min_mutation_rate = min_mutation_rate
+        self.max_mutation_rate = max_mutation_rate
+        self.adapt = adapt                      # rate factor per generation (1 disables adaptation)
+        self.patience = patience                # generations without improvement before stopping (None: never)
+        self.tol = tol                          # relative improvement that counts
+        self.time_limit = time_limit            # seconds
+        self.max_evaluations = max_evaluations  # fitness evaluations
+        self.start()
+
+    def start(self, mutation_rate=0.1):
+        """ Reset for a new run, adapting from the run's mutation_rate """
+        self.mutation_rate = mutation_rate
+        self.best_fitness = float('inf')
+        self.stalled = 0
+        self.evaluations = 0
+        self.generations = 0
+        self.start_time = time.perf_counter()
+        self.stop_reason = None
+        self.mutation_history = []
+
+    def update(self, best_fitness, evaluations):
+        """ Record one generation, returns True when the run should stop """
+        self.generations += 1
+        self.evaluations += evaluations
+        # the first generation has nothing to stall against
+        if np.isinf(self.best_fitness) or best_fitness < self.best_fitness - self.tol * abs(self.best_fitness):
+            self.stalled = 0
+            self.mutation_rate = max(self.min_mutation_rate, self.mutation_rate / self.adapt)
+        else:
+            self.stalled += 1
+            self.mutation_rate = min(self.max_mutation_rate, self.mutation_rate * self.adapt)
+        self.best_fitness = min(self.best_fitness, best_fitness)
+        self.mutation_history.append(self.mutation_rate)
+
+        if self.patience is not None and self.stalled >= self.patience:
+            self.stop_reason = f"no improvement in {self.patience} generations"
+        elif self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            self.stop_reason = f"evaluation budget of {self.max_evaluations} reached"
+        elif self.time_limit is not None and time.perf_counter() - self.start_time >= self.time_limit:
+            self.stop_reason = f"time limit of {self.time_limit} s reached"
+        return self.stop_reason is not None
+
 # Genetic Algorithm
-def genetic_algorithm(pop_size=100, generations=200, mutation_rate=0.1):
+def genetic_algorithm(pop_size=100, generations=200, mutation_rate=0.1, convergence=None):
     # Initialize population
     population = [create_individual() for _ in range(pop_size)]
+    if convergence is not None:
+        convergence.start(mutation_rate)
     
     # Evolve over generations
     best_fitness = float('inf')
@@ -103,13 +175,21 @@ def genetic_algorithm(pop_size=100, generations=200, mutation_rate=0.1):
         current_best_fitness = min(fitness_values)
         if current_best_fitness < best_fitness:
             best_fitness = current_best_fitness
-            best_individual = population[fitness_values.index(current_best_fitness)]
+            # a copy, so later changes to the population cannot alter it
+            best_individual = list(population[fitness_values.index(current_best_fitness)])
         
         fitness_history.append(best_fitness)
+        if convergence is not None:
+            if convergence.update(best_fitness, len(population)):
+                break
+            mutation_rate = convergence.mutation_rate
 
-        # Select the best individuals to reproduce
+        # Carry copies of the elites over unchanged, then select the best individuals to reproduce
         new_population = []
-        for _ in range(pop_size // 2):
+        if convergence is not None and convergence.elitism:
+            ranked = sorted(range(len(population)), key=fitness_values.__getitem__)
+            new_population = [list(population[i]) for i in ranked[:convergence.elitism]]
+        while len(new_population) < 2 * (pop_size // 2):
             parent1, parent2 = selection(population, fitness_values)
             child1 = crossover(parent1, parent2)
             child2 = crossover(parent2, parent1)
@@ -122,21 +202,626 @@ def genetic_algorithm(pop_size=100, generations=200, mutation_rate=0.1):
             
             new_population.extend([child1, child2])
         
-        population = new_population
+        population = new_population[:2 * (pop_size // 2)]
+
+    return best_individual, best_fitness, fitness_history
+
+# Array versions: the population is an (N, 3) array of [length, width, height]
+# rows and every step works on the whole generation in one NumPy pass.
+# Lower and upper bounds of length, width and height (cm), as in create_individual
+BOUNDS = np.array([[50, 5, 5], [300, 20, 20]], dtype=float)
+
+def population_fitness(population):
+    """ fitness_function for every row of an (N, 3) population """
+    length, width, height = population.T
+    weight = beam_weight(length, width, height)
+    stress = beam_bending_stress(length, width, height)
+    deflection = beam_deflection(length, width, height)
+    stress_penalty = np.maximum(0, stress - yield_stress) * 1000
+    deflection_penalty = np.maximum(0, deflection - max_deflection) * 1000
+    return weight + stress_penalty + deflection_penalty
+
+def create_population(pop_size, rng, bounds=BOUNDS):
+    """ (pop_size, n) random individuals within bounds (2 x n: lower, upper) """
+    return rng.uniform(bounds[0], bounds[1], size=(pop_size, bounds.shape[1]))
+
+def tournament_selection(fitness_values, num_parents, rng, tournament_size=3):
+    """ Indices of num_parents tournament winners (lowest fitness of tournament_size random picks) """
+    entrants = rng.integers(0, len(fitness_values), size=(num_parents, tournament_size))
+    winners = np.argmin(fitness_values[entrants], axis=1)
+    return entrants[np.arange(num_parents), winners]
+
+def crossover_population(parents1, parents2, rng):
+    """ One-point crossover of matching rows, the point drawn per child from 1..n-1 """
+    n = parents1.shape[1]
+    crossover_point = rng.integers(1, max(n, 2), size=(len(parents1), 1))
+    return np.where(np.arange(n) < crossover_point, parents1, parents2)
+
+def mutate_population(population, mutation_rate, rng, bounds=BOUNDS):
+    """ In place: each row, with probability mutation_rate, gets one variable redrawn within bounds """
+    rows = np.flatnonzero(rng.random(len(population)) < mutation_rate)
+    genes = rng.integers(0, population.shape[1], size=len(rows))
+    population[rows, genes] = rng.uniform(bounds[0, genes], bounds[1, genes])
+    return population
+
+def evolve_population(population, generations, mutation_rate, rng, fitness=population_fitness,
+                      bounds=BOUNDS, on_generation=None, convergence=None, count_evaluations=None):
+    """ Run generations of the array GA on a population
+
+    fitness maps an (N, n) population to N values; on_generation(generation,
+    best_fitness) is called after each generation's evaluation.  With a
+    Convergence the run uses its elitism and mutation rate and stops early
+    when it says so; count_evaluations() gives the fitness evaluations of the
+    last generation for its budget (default: the population size).
+
+    Returns (population, best_individual, best_fitness, fitness_history) with
+    the population after the last generation's reproduction.
+    """
+    pop_size = len(population)
+    pairs = (pop_size + 1) // 2
+    if convergence is not None:
+        convergence.start(mutation_rate)
+
+    best_fitness = float('inf')
+    best_individual = None
+    fitness_history = []
 
+    for generation in range(generations):
+        fitness_values = fitness(population)
+
+        # Track best individual (a copy, the population array is replaced below)
+        best = np.argmin(fitness_values)
+        if fitness_values[best] < best_fitness:
+            best_fitness = float(fitness_values[best])
+            best_individual = population[best].copy()
+
+        fitness_history.append(best_fitness)
+        if on_generation is not None:
+            on_generation(generation, best_fitness)
+        if convergence is not None:
+            evaluations = len(population) if count_evaluations is None else count_evaluations()
+            if convergence.update(best_fitness, evaluations):
+                break
+            mutation_rate = convergence.mutation_rate
+
+        # Two tournament winners per pair of children, children crossed both ways
+        parents = population[tournament_selection(fitness_values, 2 * pairs, rng)]
+        parents1, parents2 = parents[:pairs], parents[pairs:]
+        children = np.concatenate([crossover_population(parents1, parents2, rng),
+                                   crossover_population(parents2, parents1, rng)])[:pop_size]
+        children = mutate_population(children, mutation_rate, rng, bounds)
+        if convergence is not None and convergence.elitism:
+            # fancy indexing copies the elites out of the old population
+            children[:convergence.elitism] = population[np.argsort(fitness_values)[:convergence.elitism]]
+        population = children
+
+    return population, best_individual, best_fitness, fitness_history
+
+def genetic_algorithm_array(pop_size=100, generations=200, mutation_rate=0.1, seed=None, convergence=None):
+    """ genetic_algorithm on an (N, 3) array population, returns the same results """
+    rng = np.random.default_rng(seed)
+    population = create_population(pop_size, rng)
+    _, best_individual, best_fitness, fitness_history = evolve_population(
+        population, generations, mutation_rate, rng, convergence=convergence)
     return best_individual, best_fitness, fitness_history
 
-# Run the genetic algorithm
-best_individual, best_fitness, fitness_history = genetic_algorithm()
+# Island model: several populations evolve independently (one process each)
+# and every migration_interval generations each island sends copies of its
+# num_migrants best individuals to the next island in a ring, where they
+# replace the worst.  Island k draws from SeedSequence(seed).spawn(...)[k] and
+# its generator travels with its population, so results depend only on the
+# seed, never on the number of worker processes.
+
+def _evolve_island(args):
+    population, generations, mutation_rate, rng = args
+    return evolve_population(population, generations, mutation_rate, rng) + (rng,)
+
+def migrate(populations, num_migrants):
+    """ In place ring migration: the best of island i replace the worst of island i + 1 """
+    fitness = [population_fitness(population) for population in populations]
+    elites = [population[np.argsort(f)[:num_migrants]].copy() for population, f in zip(populations, fitness)]
+    for i, population in enumerate(populations):
+        worst = np.argsort(fitness[i])[-num_migrants:]
+        population[worst] = elites[i - 1]
+
+def island_genetic_algorithm(num_islands=4, pop_size=100, generations=200, mutation_rate=0.1,
+                             migration_interval=20, num_migrants=2, seed=None, workers=None):
+    """
+    Island-model genetic_algorithm_array.
+
+    Returns:
+    best_individual, best_fitness, fitness_history (best over all islands per generation),
+    island_histories ((num_islands, generations) array of each island's best so far)
+    """
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(num_islands)]
+    populations = [create_population(pop_size, rng) for rng in rngs]
+    island_bests = [(None, float('inf'))] * num_islands
+    island_histories = [[] for _ in range(num_islands)]
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 and num_islands > 1 else None
+    try:
+        done = 0
+        while done < generations:
+            epoch = min(migration_interval, generations - done)
+            jobs = [(population, epoch, mutation_rate, rng) for population, rng in zip(populations, rngs)]
+            results = pool.map(_evolve_island, jobs) if pool else map(_evolve_island, jobs)
+            for i, (population, best_individual, best_fitness, history, rng) in enumerate(results):
+                populations[i], rngs[i] = population, rng
+                # history restarts every epoch, carry the island's best so far across
+                island_histories[i].extend(np.minimum(history, island_bests[i][1]).tolist())
+                if best_fitness < island_bests[i][1]:
+                    island_bests[i] = (best_individual, best_fitness)
+            done += epoch
+            if done < generations and num_islands > 1 and num_migrants > 0:
+                migrate(populations, num_migrants)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    island_histories = np.array(island_histories)
+    best_island = min(range(num_islands), key=lambda i: island_bests[i][1])
+    best_individual, best_fitness = island_bests[best_island]
+    return best_individual, best_fitness, island_histories.min(axis=0).tolist(), island_histories
+
+# Expensive fitness functions.  optimize() runs the array GA on any fitness
+# callable: each generation's designs are rounded to a grid of `resolution`,
+# designs already seen are answered from an EvaluationCache and only the new
+# ones are evaluated - in one call for a vectorized fitness, otherwise in
+# process or, with workers, over a process pool.  The cache is an LRU dict,
+# optionally persisted to an append-only file of int64 rows (quantized design,
+# fitness bits) so later runs start warm.  The file starts with a header of
+# the number of variables, the resolution and the fitness identifier; a file
+# written for a different problem is rejected instead of answering from it.
+CACHE_MAGIC = b'GAC1'
+
+def fitness_identifier(fitness):
+    """ module.qualname of a fitness function, None for lambdas, closures and other callables """
+    name = getattr(fitness, '__qualname__', None)
+    if name is None or '<' in name:
+        return None
+    return f"{fitness.__module__}.{name}"
+
+class EvaluationCache:
+    def __init__(self, fitness, resolution=1e-3, maxsize=1000000, path=None, vectorized=False,
+                 fitness_id=None):
+        self.fitness = fitness
+        self.resolution = np.asarray(resolution, dtype=float)
+        self.maxsize = maxsize
+        self.path = path
+        self.vectorized = vectorized
+        self.fitness_id = fitness_id or fitness_identifier(fitness)
+        if path is not None and self.fitness_id is None:
+            raise ValueError("Give a fitness_id to persist the cache of a lambda or closure fitness")
+        self.entries = OrderedDict()   # quantized design bytes -> fitness
+        self.stats = []                # one dict per evaluate() call
+        self._loaded = path is None
+
+    def _header(self, n):
+        return {'num_variables': n, 'resolution': np.broadcast_to(self.resolution, n).tolist(),
+                'fitness': self.fitness_id}
+
+    def _load(self, n):
+        self._loaded = True
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb') as f:
+            if f.read(4) != CACHE_MAGIC:
+                raise ValueError(f"{self.path} is not an evaluation cache file")
+            header_len = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            header = json.loads(f.read(header_len))
+        expected = self._header(n)
+        if header != expected:
+            mismatch = ", ".join(f"{key} {header.get(key)} (expected {value})"
+                                 for key, value in expected.items() if header.get(key) != value)
+            raise ValueError(f"{self.path} was written for a different problem: {mismatch}")
+        rows = np.fromfile(self.path, dtype=np.int64, offset=8 + header_len).reshape(-1, n + 1)
+        for row in rows[-self.maxsize:]:
+            self.entries[row[:n].tobytes()] = float(row[n:].view(np.float64)[0])
+
+    def snap(self, population):
+        """ Designs rounded to the resolution grid, the points evaluate() scores """
+        return np.round(np.asarray(population) / self.resolution).astype(np.int64) * self.resolution
+
+    def evaluate(self, population, pool=None, chunksize=None):
+        """ Fitness of every row, evaluating only designs not in the cache """
+        start = time.perf_counter()
+        quantized = np.round(population / self.resolution).astype(np.int64)
+        if not self._loaded:
+            self._load(quantized.shape[1])
+        designs, inverse = np.unique(quantized, axis=0, return_inverse=True)
+
+        values = np.empty(len(designs))
+        missing = []
+        for i, design in enumerate(designs):
+            key = design.tobytes()
+            value = self.entries.get(key)
+            if value is None:
+                missing.append(i)
+            else:
+                values[i] = value
+                self.entries.move_to_end(key)
+
+        eval_start = time.perf_counter()
+        if missing:
+            points = designs[missing] * self.resolution
+            if self.vectorized:
+                new_values = np.asarray(self.fitness(points), dtype=float)
+            elif pool is not None:
+                chunksize = chunksize or max(1, len(points) // (4 * os.cpu_count()))
+                new_values = np.fromiter(pool.map(self.fitness, points, chunksize=chunksize), float, len(points))
+            else:
+                new_values = np.fromiter(map(self.fitness, points), float, len(points))
+            values[missing] = new_values
+            for design, value in zip(designs[missing], new_values):
+                self.entries[design.tobytes()] = float(value)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            if self.path is not None:
+                with open(self.path, 'ab') as f:
+                    if f.tell() == 0:
+                        header = json.dumps(self._header(designs.shape[1])).encode()
+                        header += b' ' * (-(8 + len(header)) % 8)
+                        f.write(CACHE_MAGIC + np.uint32(len(header)).tobytes() + header)
+                    np.column_stack([designs[missing], new_values.view(np.int64)]).tofile(f)
+        eval_time = time.perf_counter() - eval_start
+
+        self.stats.append({'designs': len(population), 'hits': len(population) - len(missing),
+                           'evaluations': len(missing), 'hit_rate': 1 - len(missing) / len(population),
+                           'eval_seconds': eval_time,
+                           'evals_per_second': len(missing) / eval_time if eval_time > 0 else float('inf'),
+                           'seconds': time.perf_counter() - start})
+        return values[inverse.ravel()]
+
+def optimize(fitness, bounds=BOUNDS, pop_size=100, generations=200, mutation_rate=0.1, seed=None,
+             vectorized=False, resolution=1e-3, cache_size=1000000, cache_path=None, workers=1,
+             verbose=True, convergence=None, fitness_id=None):
+    """
+    Array GA on any fitness callable (one design -> float, or an (N, n)
+    population -> N values with vectorized=True), minimized within bounds.
+    Fitness is evaluated at designs rounded to resolution (scalar or per variable).
+    A non-vectorized fitness runs in process unless workers != 1 (None: one
+    process per core), which needs a picklable module-level function.
+    cache_path persists the cache; fitness_id names the fitness in its header
+    and is required when fitness is a lambda or closure.
+
+    Returns:
+    best_individual (on the resolution grid, the design best_fitness was
+    evaluated at), best_fitness, fitness_history, cache (cache.stats holds
+    the per-generation hit rate and evaluations per second)
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    rng = np.random.default_rng(seed)
+    cache = EvaluationCache(fitness, resolution, cache_size, cache_path, vectorized, fitness_id)
+    pool = ProcessPoolExecutor(max_workers=workers) if not vectorized and workers != 1 else None
+
+    def report(generation, best_fitness):
+        stats = cache.stats[-1]
+        print(f"Generation {generation}: best {best_fitness:.2f}, {stats['evaluations']} evaluations "
+              f"({stats['evals_per_second']:.0f}/s), cache hit rate {stats['hit_rate'] * 100:.0f}%")
+
+    try:
+        _, best_individual, best_fitness, fitness_history = evolve_population(
+            create_population(pop_size, rng, bounds), generations, mutation_rate, rng,
+            lambda population: cache.evaluate(population, pool), bounds, report if verbose else None,
+            convergence, lambda: cache.stats[-1]['evaluations'])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return cache.snap(best_individual), best_fitness, fitness_history, cache
+
+def fea_beam_fitness(individual, num_elements_x=40, num_elements_y=4):
+    """ fitness_function with the stress and deflection taken from a plane stress
+    FEA solve of the simply supported, centre loaded beam (fea_solver) """
+    import fea_solver
+    import mesh_generator
+    from mesh_sets import MeshSets
+
+    length, width, height = individual
+    span, depth = length / 100, height / 100   # m
+    nodes, elements = mesh_generator.generate_structured_mesh(span, depth, num_elements_x + 1,
+                                                              num_elements_y + 1)
+    sets = MeshSets(nodes, elements)
+    pin = sets.add_node_set('pin', box=((0, 0), (0, 0)))
+    roller = sets.add_node_set('roller', box=((span, 0), (span, 0)))
+    top = sets.add_node_set('load', circle=((span / 2, depth), span / num_elements_x / 2))
+    bottom = sets.add_node_set('mid', circle=((span / 2, 0), span / num_elements_x / 2))
+    fixed = np.concatenate([fea_solver.node_dofs(pin), fea_solver.node_dofs(roller, 'y')])
+    loads = fea_solver.nodal_loads(len(nodes), top, fy=-applied_load)
+    solution = fea_solver.solve(nodes, elements, fixed, loads, E=E * 1e6, thickness=width / 100)
+
+    weight = beam_weight(length, width, height)
+    # bending stress in the bottom row of elements (the load point itself is singular)
+    bottom_row = sets.add_element_set('bottom', box=((0, 0), (span, depth / num_elements_y)))
+    stress = np.abs(solution.stress[bottom_row, 0]).max() / 1e6     # MPa
+    deflection = -solution.displacements[bottom, 1].mean() * 100      # cm
+    stress_penalty = max(0, stress - yield_stress) * 1000
+    deflection_penalty = max(0, deflection - max_deflection) * 1000
+    return weight + stress_penalty + deflection_penalty
+
+# Gradient based and surrogate assisted backends.  Both work in coordinates
+# scaled to [0, 1] within the bounds and return their evaluation log, the
+# designs evaluated in order and their fitness; minimize_design puts them and
+# the GA behind one call and one result type.
+def _from_unit(u, bounds):
+    return bounds[0] + np.clip(u, 0, 1) * (bounds[1] - bounds[0])
+
+def slsqp_optimize(fitness=None, bounds=BOUNDS, starts=1, seed=None, tol=1e-10, max_iterations=200):
+    """
+    SLSQP from the centre of the bounds, then from starts - 1 random points.
+
+    With fitness=None it solves the beam problem as stated: minimize
+    beam_weight subject to beam_bending_stress <= yield_stress and
+    beam_deflection <= max_deflection, with the analytic gradients.  One
+    evaluation is one beam analysis (values and gradients at a new design),
+    logged as fitness_function.  Any other fitness is minimized directly with
+    finite difference gradients, every call counting as an evaluation.
+
+    Returns:
+    designs (k x n array), values (k,) in evaluation order
+    """
+    from scipy.optimize import minimize
+
+    bounds = np.asarray(bounds, dtype=float)
+    scale = bounds[1] - bounds[0]
+    rng = np.random.default_rng(seed)
+    designs, values = [], []
+
+    if fitness is None:
+        weight_scale = beam_weight(*bounds.mean(axis=0))
+        last = {}
+
+        def analysis(u):
+            if last.get('u') is None or not np.array_equal(last['u'], u):
+                x = _from_unit(u, bounds)
+                designs.append(x)
+                values.append(fitness_function(x))
+                # constraints as 1 - value / limit >= 0, everything scaled to order one
+                last.update(u=u.copy(),
+                            f=beam_weight(*x) / weight_scale,
+                            df=beam_weight_gradient(*x) * scale / weight_scale,
+                            g=np.array([1 - beam_bending_stress(*x) / yield_stress,
+                                        1 - beam_deflection(*x) / max_deflection]),
+                            dg=-np.array([beam_bending_stress_gradient(*x) / yield_stress,
+                                          beam_deflection_gradient(*x) / max_deflection]) * scale)
+            return last
+
+        problem = dict(fun=lambda u: analysis(u)['f'], jac=lambda u: analysis(u)['df'],
+                       constraints={'type': 'ineq', 'fun': lambda u: analysis(u)['g'],
+                                    'jac': lambda u: analysis(u)['dg']})
+    else:
+        def objective(u):
+            x = _from_unit(u, bounds)
+            designs.append(x)
+            values.append(float(fitness(x)))
+            return values[-1]
+
+        problem = dict(fun=objective)
+
+    for start in range(starts):
+        u0 = np.full(len(scale), 0.5) if start == 0 else rng.random(len(scale))
+        minimize(x0=u0, method='SLSQP', bounds=[(0, 1)] * len(scale), tol=tol,
+                 options={'maxiter': max_iterations}, **problem)
+    return np.array(designs), np.array(values)
+
+class GaussianProcess:
+    """ Gaussian process regression with a Matern 5/2 kernel, one length scale per
+    variable; length scales, amplitude and noise are fitted by maximum likelihood """
+
+    def _kernel(self, A, B, length_scale, amplitude):
+        r = np.sqrt(5 * (((A[:, None, :] - B[None, :, :]) / length_scale)**2).sum(axis=2))
+        return amplitude * (1 + r + r**2 / 3) * np.exp(-r)
+
+    def _factor(self, X, z, params):
+        from scipy.linalg import cho_factor, cho_solve
+
+        length_scale, (amplitude, noise) = np.exp(params[:-2]), np.exp(params[-2:])
+        K = self._kernel(X, X, length_scale, amplitude) + (noise + 1e-10) * np.eye(len(X))
+        factor = cho_factor(K, lower=True)
+        return factor, cho_solve(factor, z)
+
+    def _negative_log_likelihood(self, params, X, z):
+        try:
+            factor, alpha = self._factor(X, z, params)
+        except np.linalg.LinAlgError:
+            return np.inf
+        return 0.5 * z @ alpha + np.log(np.diag(factor[0])).sum()
+
+    def fit(self, X, y):
+        """ Fit to standardized y """
+        from scipy.optimize import minimize
+
+        self.X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean, self.y_std = y.mean(), y.std() or 1.0
+        z = (y - self.y_mean) / self.y_std
+        n = self.X.shape[1]
+        start = np.log(np.r_[np.full(n, 0.3), 1.0, 1e-3])
+        limits = np.log([(0.01, 10)] * n + [(1e-2, 1e2), (1e-8, 1e-1)])
+        result = minimize(self._negative_log_likelihood, start, args=(self.X, z), method='L-BFGS-B',
+                          bounds=limits)
+        self.params = result.x
+        self.length_scale, self.amplitude = np.exp(self.params[:-2]), np.exp(self.params[-2])
+        self.factor, self.alpha = self._factor(self.X, z, self.params)
+        return self
+
+    def predict(self, X):
+        """ Posterior mean and standard deviation at the rows of X """
+        from scipy.linalg import solve_triangular
+
+        Ks = self._kernel(np.asarray(X, dtype=float), self.X, self.length_scale, self.amplitude)
+        mean = Ks @ self.alpha
+        v = solve_triangular(self.factor[0], Ks.T, lower=True)
+        variance = np.maximum(self.amplitude - (v**2).sum(axis=0), 1e-12)
+        return self.y_mean + self.y_std * mean, self.y_std * np.sqrt(variance)
+
+def expected_improvement(mean, std, best, xi=0.01):
+    """ Expected amount by which a design improves on best (minimization) """
+    from scipy.stats import norm
+
+    improvement = best - mean - xi * std
+    z = improvement / std
+    return improvement * norm.cdf(z) + std * norm.pdf(z)
+
+# Perturbation sizes (fraction of the bounds) of the candidates around the best design
+LOCAL_STEPS = np.array([0.1, 0.02, 0.005])
+
+def bayesian_optimize(fitness=None, bounds=BOUNDS, max_evaluations=60, initial=10, candidates=5000,
+                      seed=None, log=True):
+    """
+    Bayesian optimization for expensive fitness functions: a Latin hypercube of
+    `initial` designs, then one design per step at the maximum expected
+    improvement of a Gaussian process fitted to every evaluation so far.
+    Candidates are random designs plus perturbations of the best one at
+    the LOCAL_STEPS scales.  With
+    log=True the process models log(fitness), which tames the penalty terms.
+
+    Returns:
+    designs (k x n array), values (k,) in evaluation order
+    """
+    from scipy.stats import qmc
+
+    fitness = fitness_function if fitness is None else fitness
+    bounds = np.asarray(bounds, dtype=float)
+    n = bounds.shape[1]
+    rng = np.random.default_rng(seed)
+
+    U = qmc.LatinHypercube(d=n, seed=rng).random(min(initial, max_evaluations))
+    values = [float(fitness(_from_unit(u, bounds))) for u in U]
+    transform = np.log if log else np.asarray
+    while len(values) < max_evaluations:
+        y = transform(np.array(values))
+        gp = GaussianProcess().fit(U, y)
+        best = np.argmin(y)
+        local = U[best] + np.repeat(LOCAL_STEPS, candidates // 10)[:, None] * rng.standard_normal(
+            (len(LOCAL_STEPS) * (candidates // 10), n))
+        pool = np.concatenate([rng.random((candidates, n)), np.clip(local, 0, 1)])
+        mean, std = gp.predict(pool)
+        u = pool[np.argmax(expected_improvement(mean, std, y[best]))]
+        U = np.vstack([U, u])
+        values.append(float(fitness(_from_unit(u, bounds))))
+    return _from_unit(U, bounds), np.array(values)
+
+class OptimizationResult:
+    def __init__(self, method, best_individual, best_fitness, history, seconds):
+        self.method = method
+        self.best_individual = best_individual
+        self.best_fitness = best_fitness
+        self.history = history                # best fitness so far after each evaluation
+        self.seconds = seconds
+
+    @property
+    def evaluations(self):
+        return len(self.history)
+
+    def evaluations_to(self, target, rtol=1e-2):
+        """ Evaluations until the best fitness is within rtol of target, None if never """
+        reached = np.flatnonzero(self.history <= target + rtol * abs(target))
+        return int(reached[0]) + 1 if len(reached) else None
+
+def minimize_design(method='ga', fitness=None, bounds=BOUNDS, seed=None, **options):
+    """
+    One entry point for every optimizer backend, minimizing within bounds.
+
+    Parameters:
+    method (str): 'ga' (optimize), 'slsqp' (slsqp_optimize) or 'bayes' (bayesian_optimize)
+    fitness (callable): One design -> float; None is the beam problem, which
+        the GA evaluates vectorized and SLSQP solves with analytic gradients
+    options: Passed on to the backend
+
+    Returns:
+    OptimizationResult
+    """
+    if method not in ('ga', 'slsqp', 'bayes'):
+        raise ValueError(f"Invalid method '{method}', use 'ga', 'slsqp' or 'bayes'")
+    start = time.perf_counter()
+    if method == 'ga':
+        if fitness is None:
+            fitness, options = population_fitness, dict(options, vectorized=True)
+        best_individual, best_fitness, fitness_history, cache = optimize(
+            fitness, bounds, seed=seed, **dict(dict(verbose=False), **options))
+        # every evaluation of a generation is credited with that generation's best
+        history = np.repeat(fitness_history, [stats['evaluations'] for stats in cache.stats])
+    else:
+        backend = slsqp_optimize if method == 'slsqp' else bayesian_optimize
+        designs, values = backend(fitness, bounds, seed=seed, **options)
+        best = np.argmin(values)
+        best_individual, best_fitness = designs[best], values[best]
+        history = np.minimum.accumulate(values)
+    return OptimizationResult(method, best_individual, best_fitness, history, time.perf_counter() - start)
+
+def compare_methods(seed=0, rtol=2e-2):
+    """ Evaluations each backend needs to get within rtol of the SLSQP optimum of the beam problem """
+    results = {'slsqp': minimize_design('slsqp', seed=seed),
+               'ga': minimize_design('ga', seed=seed, pop_size=100, generations=200),
+               'ga + convergence': minimize_design('ga', seed=seed, pop_size=100, generations=200,
+                                                   convergence=Convergence()),
+               'bayes': minimize_design('bayes', seed=seed, max_evaluations=60)}
+    target = results['slsqp'].best_fitness
+    return target, [(name, result, result.evaluations_to(target, rtol)) for name, result in results.items()]
+
+def benchmark(pop_sizes=(1000, 100000, 1000000), generations=5):
+    """ Seconds per generation of the list and array versions """
+    results = []
+    for pop_size in pop_sizes:
+        list_time = None
+        if pop_size <= 10000:
+            start = time.perf_counter()
+            genetic_algorithm(pop_size, generations)
+            list_time = (time.perf_counter() - start) / generations
+        start = time.perf_counter()
+        genetic_algorithm_array(pop_size, generations, seed=0)
+        array_time = (time.perf_counter() - start) / generations
+        results.append((pop_size, list_time, array_time))
+    return results
+
+def main():
+    # Run the genetic algorithm
+    best_individual, best_fitness, fitness_history = genetic_algorithm_array(pop_size=10000)
+
+    # Results
+    print(f"Optimal Design (Length, Width, Height): {best_individual.tolist()}")
+    print(f"Optimal Weight: {best_fitness:.2f} g")
+
+    # Elitism, adaptive mutation and early stopping once the best weight plateaus
+    convergence = Convergence(patience=30)
+    stopped_best, stopped_fitness, stopped_history = genetic_algorithm_array(pop_size=10000, seed=0,
+                                                                             convergence=convergence)
+    print(f"Early stopping: {stopped_best.tolist()}, {stopped_fitness:.2f} g after "
+          f"{len(stopped_history)} generations, {convergence.evaluations} evaluations "
+          f"({convergence.stop_reason})")
+
+    # Same total population split over 4 islands with migration
+    island_best, island_fitness, _, _ = island_genetic_algorithm(num_islands=4, pop_size=2500, seed=0)
+    print(f"Island model (4 x 2500): {island_best.tolist()}, {island_fitness:.2f} g")
+
+    # Stress and deflection from FEA instead of the beam formulas
+    fea_best, fea_fitness, _, cache = optimize(fea_beam_fitness, pop_size=20, generations=10,
+                                               resolution=0.5, seed=0)
+    evaluations = sum(stats['evaluations'] for stats in cache.stats)
+    print(f"FEA fitness: {fea_best.tolist()}, {fea_fitness:.2f} g ({evaluations} FEA solves)")
+    # the returned design is the one that was scored, not a nearby unrounded one
+    if fea_beam_fitness(fea_best) != fea_fitness:
+        raise RuntimeError("optimize returned a design that does not match its fitness")
+
+    # Same beam problem with every backend, evaluations to within 2% of the SLSQP optimum
+    target, comparison = compare_methods()
+    for name, result, evaluations in comparison:
+        reached = evaluations if evaluations is not None else "-"
+        print(f"{name:>16}: {result.best_fitness:.2f} g, {result.evaluations} evaluations, "
+              f"{reached} to within 2% of {target:.2f} g, {result.seconds:.2f} s")
+
+    for pop_size, list_time, array_time in benchmark():
+        list_text = f"{list_time * 1000:.1f} ms" if list_time is not None else "-"
+        print(f"Population {pop_size}: list {list_text}, array {array_time * 1000:.1f} ms per generation")
+
+    # Plotting Fitness History (Convergence)
+    plt.plot(fitness_history)
+    plt.xlabel('Generation')
+    plt.ylabel('Best Fitness (Weight + Penalties)')
+    plt.title('Genetic Algorithm Convergence')
+    plt.grid(True)
+    plt.show()
 
-# Results
-print(f"Optimal Design (Length, Width, Height): {best_individual}")
-print(f"Optimal Weight: {best_fitness:.2f} g")
+if __name__ == "__main__":
+    main()
 
-# Plotting Fitness History (Convergence)
-plt.plot(fitness_history)
-plt.xlabel('Generation')
-plt.ylabel('Best Fitness (Weight + Penalties)')
-plt.title('Genetic Algorithm Convergence')
-plt.grid(True)
-plt.show()
@@ -1,90 +1,292 @@
+import json
+
 import numpy as np
 import matplotlib.pyplot as plt
 
-# Define the size of the beam
-length = 10  # Length of the beam (in meters)
-width = 1    # Width of the beam (in meters)
-
-# Define how many nodes we want in each direction (along the length and width)
-num_nodes_x = 11  # Number of nodes in the x-direction (along the length)
-num_nodes_y = 2   # Number of nodes in the y-direction (along the width)
-
-# Choose the type of elements for the mesh (we'll use quadrilateral elements here)
-element_type = 'quad'  # 'quad' for quadrilateral, 'tri' for triangular elements
+from mesh_sets import MeshSets
 
 # Define material properties (using values for steel here)
 E = 210e9  # Young's modulus (a measure of stiffness) in Pascals (Pa) for Steel
 nu = 0.3   # Poisson's ratio (describes the ratio of lateral strain to axial strain)
 
-# Generate the node coordinates (position of the nodes in the grid)
-x = np.linspace(0, length, num_nodes_x)  # Nodes along the length of the beam
-y = np.linspace(0, width, num_nodes_y)   # Nodes along the width of the beam
+ELEMENT_TYPES = ('quad', 'tri')
+
+
+def index_dtype(count):
+    """ Smallest integer dtype that can index `count` nodes """
+    return np.int32 if count <= np.iinfo(np.int32).max else np.int64
+
+
+def generate_structured_mesh(length=10, width=1, num_nodes_x=11, num_nodes_y=2, element_type='quad'):
+    """
+    Structured mesh of a length x width rectangle.
+
+    Node i * num_nodes_y + j sits at (x[i], y[j]).  Quads are
+    (n1, n2, n3, n4) counter-clockwise from the lower left corner; 'tri'
+    splits every quad along its n1-n3 diagonal into (n1, n2, n3) and
+    (n1, n3, n4), also counter-clockwise.
+
+    Returns:
+    nodes (N x 2 float64 array), elements (M x 4 or M x 3 int32 array, int64 past 2**31 nodes)
+    """
+    if element_type not in ELEMENT_TYPES:
+        raise ValueError(f"Invalid element type '{element_type}'. Use one of: {', '.join(ELEMENT_TYPES)}")
+    if num_nodes_x < 2 or num_nodes_y < 2:
+        raise ValueError("Need at least 2 nodes in each direction")
+    nx, ny = num_nodes_x, num_nodes_y
+
+    # Node coordinates, written in place through an (nx, ny, 2) view so no
+    # full-size temporaries are made
+    nodes = np.empty((nx * ny, 2))
+    grid = nodes.reshape(nx, ny, 2)
+    grid[:, :, 0] = np.linspace(0, length, nx)[:, None]
+    grid[:, :, 1] = np.linspace(0, width, ny)[None, :]
+
+    # Lower left node of every quad, then the other corners by offset
+    dtype = index_dtype(nx * ny)
+    corners = np.empty((nx - 1, ny - 1, 4), dtype=dtype)
+    n1 = corners[:, :, 0]
+    np.add(np.arange(nx - 1, dtype=dtype)[:, None] * dtype(ny), np.arange(ny - 1, dtype=dtype)[None, :], out=n1)
+    np.add(n1, ny, out=corners[:, :, 1])        # n2 = (i + 1) * ny + j
+    np.add(n1, ny + 1, out=corners[:, :, 2])    # n3 = (i + 1) * ny + j + 1
+    np.add(n1, 1, out=corners[:, :, 3])         # n4 = i * ny + j + 1
+    if element_type == 'quad':
+        return nodes, corners.reshape(-1, 4)
 
-# Create a list of nodes by combining the x and y coordinates
-nodes = np.array([[i, j] for i in x for j in y])
+    triangles = np.empty((nx - 1, ny - 1, 2, 3), dtype=dtype)
+    triangles[:, :, 0] = corners[:, :, :3]
+    triangles[:, :, 1, 0] = n1
+    triangles[:, :, 1, 1:] = corners[:, :, 2:]
+    return nodes, triangles.reshape(-1, 3)
 
-# Now, we create the elements (each element connects four nodes in a quadrilateral shape)
-elements = []
-for i in range(num_nodes_x - 1):  # Loop over each row of nodes
-    for j in range(num_nodes_y - 1):  # Loop over each column of nodes
-        # Define the four nodes that make up a quadrilateral element
-        n1 = i * num_nodes_y + j
-        n2 = (i + 1) * num_nodes_y + j
-        n3 = (i + 1) * num_nodes_y + (j + 1)
-        n4 = i * num_nodes_y + (j + 1)
-        elements.append([n1, n2, n3, n4])  # Store each element's node indices
 
-# Convert the lists of nodes and elements into numpy arrays for easier handling
-nodes = np.array(nodes)
-elements = np.array(elements)
+# plot_mesh stops drawing node dots past this many nodes, and element edges
+# once elements get smaller than this many pixels (the edges then hide the
+# faces)
+MAX_PLOTTED_NODES = 5000
+MIN_PIXELS_PER_EDGED_ELEMENT = 400
+
+
+def element_mean(values, elements):
+    """ Mean of per-node values over each element's nodes (also gives centroids from nodes) """
+    total = values[elements[:, 0]].astype(float)
+    for k in range(1, elements.shape[1]):
+        total += values[elements[:, k]]
+    return total / elements.shape[1]
+
 
 # Function to plot the mesh and visualize the nodes and elements
-def plot_mesh():
-    plt.figure(figsize=(10, 5))  # Create a figure with a specific size
-    for element in elements:  # Loop through each element
-        # Get the coordinates of the nodes that make up the element
-        node_coords = nodes[element, :]
-        # Draw the element as a polygon (each element is a quadrilateral)
-        polygon = plt.Polygon(node_coords, edgecolor='k', facecolor='none')
-        plt.gca().add_patch(polygon)  # Add the polygon to the plot
-
-    # Plot the nodes as red dots
-    plt.scatter(nodes[:, 0], nodes[:, 1], color='red', marker='o')
-    plt.xlim([0, length])  # Set the limits of the x-axis
-    plt.ylim([0, width])  # Set the limits of the y-axis
-    plt.xlabel('X (m)')  # Label for the x-axis
-    plt.ylabel('Y (m)')  # Label for the y-axis
-    plt.title('FEA Mesh')  # Title of the plot
-    plt.show()  # Show the plot
-
-# Call the function to plot the mesh
-plot_mesh()
-
-# Apply boundary conditions: Fix the left side of the beam (where x = 0)
-# In this case, we apply fixed supports at all nodes where x = 0
-fixed_nodes = nodes[nodes[:, 0] == 0]
-
-# Define the boundary conditions (displacement is zero at the fixed nodes)
-boundary_conditions = {}
-for i, node in enumerate(fixed_nodes):
-    boundary_conditions[node[0]] = {'ux': 0, 'uy': 0}  # No displacement in x and y directions
-
-# Print out the boundary conditions for the fixed nodes
-print(f"Boundary conditions (Fixed at x=0): {boundary_conditions}")
+def plot_mesh(nodes, elements, values=None, path=None, label=None, title='FEA Mesh',
+              figsize=(10, 5), dpi=100, cmap='viridis', max_polygons=None):
+    """
+    Draw the mesh as one PolyCollection, optionally colored by values (one
+    per element, or one per node averaged over each element).
+
+    Meshes with more elements than max_polygons (default: the figure's pixel
+    count / 4) are aggregated instead: element values are averaged onto a
+    pixel grid and drawn as an image.  With path the figure is rendered
+    off-screen (no pyplot) and saved, e.g. to a PNG; otherwise it is shown.
+    Returns the Figure.
+    """
+    from matplotlib.collections import PolyCollection
+    from matplotlib.figure import Figure
+
+    nodes = np.asarray(nodes)
+    elements = np.asarray(elements)
+    if values is not None:
+        values = np.asarray(values, dtype=float)
+        if len(values) == len(nodes) and len(values) != len(elements):
+            values = element_mean(values, elements)
+    pixels = figsize[0] * figsize[1] * dpi**2
+    if max_polygons is None:
+        max_polygons = pixels // 4
+
+    fig = Figure(figsize=figsize, dpi=dpi) if path else plt.figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots() if path else fig.gca()
+    lo, hi = nodes.min(axis=0), nodes.max(axis=0)
+    if len(elements) <= max_polygons:
+        edged = values is None or len(elements) * MIN_PIXELS_PER_EDGED_ELEMENT <= pixels
+        mesh = PolyCollection(nodes[elements], edgecolors='k' if edged else 'face',
+                              linewidths=0.5 if edged else 0,
+                              facecolors='none' if values is None else None, cmap=cmap)
+        if values is not None:
+            mesh.set_array(values)
+        ax.add_collection(mesh)
+    else:
+        # aggregate element centroids onto one bin per pixel, or fewer where
+        # elements are larger than a pixel along an axis (no empty bins)
+        sample = nodes[elements[::max(1, len(elements) // 1000)]]
+        element_size = np.median(sample.max(axis=1) - sample.min(axis=1), axis=0)
+        pixels_xy = np.array([int(figsize[0] * dpi), int(figsize[1] * dpi)])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            across = np.where(element_size > 0, np.floor((hi - lo) / element_size), pixels_xy)
+        bins = np.clip(across, 1, pixels_xy).astype(np.int64)
+        centroids = element_mean(nodes, elements)
+        cells = ((centroids - lo) / np.maximum(hi - lo, 1e-300) * bins).astype(np.int64)
+        np.clip(cells, 0, bins - 1, out=cells)
+        flat = cells[:, 1] * bins[0] + cells[:, 0]
+        counts = np.bincount(flat, minlength=bins.prod()).reshape(bins[1], bins[0])
+        if values is None:
+            image = np.where(counts > 0, 1.0, np.nan)
+            cmap = 'Greys'
+        else:
+            totals = np.bincount(flat, weights=values, minlength=bins.prod()).reshape(bins[1], bins[0])
+            with np.errstate(invalid='ignore'):
+                image = totals / counts
+        mesh = ax.imshow(image, origin='lower', extent=(lo[0], hi[0], lo[1], hi[1]), aspect='auto',
+                         cmap=cmap, interpolation='nearest', vmin=0 if values is None else None,
+                         vmax=2 if values is None else None)
+    if values is not None:
+        fig.colorbar(mesh, ax=ax, label=label)
+
+    # Plot the nodes as red dots (small meshes only)
+    if len(nodes) <= MAX_PLOTTED_NODES:
+        ax.scatter(nodes[:, 0], nodes[:, 1], color='red', marker='o', s=10, zorder=3)
+    ax.set_xlim([lo[0], hi[0]])  # Set the limits of the x-axis
+    ax.set_ylim([lo[1], hi[1]])  # Set the limits of the y-axis
+    ax.set_xlabel('X (m)')  # Label for the x-axis
+    ax.set_ylabel('Y (m)')  # Label for the y-axis
+    ax.set_title(title)  # Title of the plot
+    if path:
+        fig.savefig(path)
+    else:
+        plt.show()  # Show the plot
+    return fig
+
+
+# Binary mesh file: b'MSH1', uint32 header length, JSON header (padded so the
+# data that follows is 8-byte aligned), then the nodes as contiguous float64
+# (num_nodes x dim) and the elements as contiguous int32 (or int64)
+# (num_elements x nodes_per_element).  load_mesh memory-maps both blocks, so
+# loading costs the same for any mesh size.
+MESH_MAGIC = b'MSH1'
+
+
+def save_mesh(filename, nodes, elements):
+    nodes = np.ascontiguousarray(nodes, dtype='<f8')
+    elements = np.ascontiguousarray(elements, dtype=np.dtype(index_dtype(len(nodes))).newbyteorder('<'))
+    header = json.dumps({'num_nodes': nodes.shape[0], 'dim': nodes.shape[1],
+                         'num_elements': elements.shape[0], 'nodes_per_element': elements.shape[1],
+                         'element_dtype': elements.dtype.str}).encode()
+    header += b' ' * (-(8 + len(header)) % 8)
+    with open(filename, 'wb') as f:
+        f.write(MESH_MAGIC + np.uint32(len(header)).tobytes() + header)
+        nodes.tofile(f)
+        elements.tofile(f)
+
+
+def load_mesh(filename, mmap=True):
+    """ (nodes, elements) from a save_mesh file, read-only memory maps unless mmap=False """
+    with open(filename, 'rb') as f:
+        if f.read(4) != MESH_MAGIC:
+            raise ValueError(f"{filename} is not a binary mesh file")
+        header_len = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+        header = json.loads(f.read(header_len))
+    offset = 8 + header_len
+    node_shape = (header['num_nodes'], header['dim'])
+    element_shape = (header['num_elements'], header['nodes_per_element'])
+    element_dtype = np.dtype(header['element_dtype'])
+    if not mmap:
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            nodes = np.fromfile(f, dtype='<f8', count=node_shape[0] * node_shape[1]).reshape(node_shape)
+            elements = np.fromfile(f, dtype=element_dtype,
+                                   count=element_shape[0] * element_shape[1]).reshape(element_shape)
+        return nodes, elements
+    nodes = np.memmap(filename, dtype='<f8', mode='r', offset=offset, shape=node_shape)
+    elements = np.memmap(filename, dtype=element_dtype, mode='r',
+                         offset=offset + nodes.nbytes, shape=element_shape)
+    return nodes, elements
+
 
 # Save the mesh data to a text file so it can be used in a solver later
-def save_mesh_to_file(filename):
+# (Nodes / Elements layout, written block_size rows at a time)
+def save_mesh_to_file(filename, nodes, elements, block_size=65536):
     with open(filename, 'w') as f:  # Open the file in write mode
         f.write("Nodes\n")  # Start by writing the header for the nodes section
-        for node in nodes:
+        for start in range(0, len(nodes), block_size):
             # Write the x and y coordinates of each node
-            f.write(f"{node[0]} {node[1]}\n")
+            np.savetxt(f, nodes[start:start + block_size], fmt='%.17g')
 
         f.write("\nElements\n")  # Write the header for the elements section
-        for element in elements:
+        for start in range(0, len(elements), block_size):
             # Write the indices of the nodes for each element
-            f.write(" ".join(map(str, element)) + "\n")
+            np.savetxt(f, elements[start:start + block_size], fmt='%d')
+
+
+def _read_text_section(f, dtype, columns, block_size):
+    """ Rows up to a blank line or the end of the file, parsed block_size lines at a time """
+    blocks, lines = [], []
+    for line in f:
+        if not line.strip():
+            break
+        lines.append(line)
+        if len(lines) == block_size:
+            blocks.append(np.loadtxt(lines, dtype=dtype, ndmin=2))
+            lines = []
+    if lines:
+        blocks.append(np.loadtxt(lines, dtype=dtype, ndmin=2))
+    return np.concatenate(blocks) if blocks else np.zeros((0, columns), dtype=dtype)
+
+
+def load_mesh_from_file(filename, block_size=65536):
+    """ (nodes, elements) from a save_mesh_to_file text file """
+    with open(filename) as f:
+        if f.readline().strip() != 'Nodes':
+            raise ValueError(f"{filename} does not start with a 'Nodes' section")
+        nodes = _read_text_section(f, float, 2, block_size)
+        line = f.readline()
+        while line and not line.strip():
+            line = f.readline()
+        if line.strip() != 'Elements':
+            raise ValueError(f"{filename} has no 'Elements' section")
+        elements = _read_text_section(f, index_dtype(len(nodes)), 4, block_size)
+    return nodes, elements
+
+
+def convert_mesh(source, destination):
+    """ Convert between the text (.txt) and binary mesh formats, by extension """
+    nodes, elements = load_mesh_from_file(source) if source.endswith('.txt') else load_mesh(source)
+    if destination.endswith('.txt'):
+        save_mesh_to_file(destination, nodes, elements)
+    else:
+        save_mesh(destination, nodes, elements)
+
+
+def main():
+    # Define the size of the beam
+    length = 10  # Length of the beam (in meters)
+    width = 1    # Width of the beam (in meters)
+
+    # Define how many nodes we want in each direction (along the length and width)
+    num_nodes_x = 11  # Number of nodes in the x-direction (along the length)
+    num_nodes_y = 2   # Number of nodes in the y-direction (along the width)
+
+    # Choose the type of elements for the mesh
+    element_type = 'quad'  # 'quad' for quadrilateral, 'tri' for triangular elements
+
+    nodes, elements = generate_structured_mesh(length, width, num_nodes_x, num_nodes_y, element_type)
+
+    # Plot the mesh
+    plot_mesh(nodes, elements)
+
+    # Apply boundary conditions: Fix the left side of the beam (where x = 0)
+    # In this case, we apply fixed supports at all nodes on the left side
+    sets = MeshSets(nodes, elements)
+    sets.add_side('left')
+
+    # Define the boundary conditions (displacement is zero at the fixed nodes),
+    # keyed by node index
+    boundary_conditions = sets.boundary_conditions('left', ux=0, uy=0)
+
+    # Print out the boundary conditions for the fixed nodes
+    print(f"Boundary conditions (Fixed at x=0): {boundary_conditions}")
+
+    # Save the mesh data to 'mesh.txt', and in binary form to 'mesh.bin'
+    save_mesh_to_file('mesh.txt', nodes, elements)
+    save_mesh('mesh.bin', nodes, elements)
+    print("Mesh saved to 'mesh.txt' and 'mesh.bin'")
+
 
-# Save the mesh data to a file called 'mesh.txt'
-save_mesh_to_file('mesh.txt')
-print("Mesh saved to 'mesh.txt'")
+if __name__ == "__main__":
+    main()
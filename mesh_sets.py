@@ -0,0 +1,146 @@
+import numpy as np
+
+# Named node and element sets for mesh_generator meshes.
+#
+# A set is a sorted integer index array, so supports and loads apply in bulk
+# (fea_solver.node_dofs(sets.nodes['left']), fea_solver.nodal_loads(...)).
+# Sets are tagged by a vectorized predicate on the coordinates, or by a
+# geometric region (box, circle) looked up in a uniform grid hash of the
+# points: only the points in the grid cells the region overlaps are tested.
+# Coordinate comparisons use a tolerance scaled to the mesh size instead of
+# exact float equality.
+
+SIDES = ('left', 'right', 'bottom', 'top')
+
+
+class GridIndex:
+    """ Uniform grid hash of 2D points, about `per_cell` points per cell """
+
+    def __init__(self, points, per_cell=4):
+        self.points = np.asarray(points, dtype=float)
+        self.lo = self.points.min(axis=0)
+        extent = self.points.max(axis=0) - self.lo
+        # size cells from the area of the non-degenerate axes
+        spread = extent[extent > 0]
+        if len(spread):
+            self.cell_size = (np.prod(spread) * per_cell / len(self.points)) ** (1 / len(spread))
+        else:
+            self.cell_size = 1.0
+        self.shape = (extent // self.cell_size).astype(np.int64) + 1
+
+        cells = self._cell_ids(self._cells(self.points))
+        self.order = np.argsort(cells, kind='stable')
+        # points of cell c are order[starts[c]:starts[c + 1]]
+        self.starts = np.searchsorted(cells[self.order], np.arange(np.prod(self.shape) + 1))
+
+    def _cells(self, points):
+        return np.clip(((points - self.lo) // self.cell_size).astype(np.int64), 0, self.shape - 1)
+
+    def _cell_ids(self, cells):
+        return cells[..., 0] * self.shape[1] + cells[..., 1]
+
+    def candidates(self, lo, hi):
+        """ Indices of the points in the grid cells overlapping the box lo..hi """
+        c0, c1 = self._cells(np.asarray([lo, hi], dtype=float))
+        ix = np.arange(c0[0], c1[0] + 1)
+        iy = np.arange(c0[1], c1[1] + 1)
+        cells = (ix[:, None] * self.shape[1] + iy[None, :]).ravel()
+        first, counts = self.starts[cells], self.starts[cells + 1] - self.starts[cells]
+        # concatenate order[first:first + count] for every cell without a loop
+        offsets = np.repeat(first - np.cumsum(counts) + counts, counts)
+        return self.order[offsets + np.arange(counts.sum())]
+
+    def in_box(self, lo, hi, tol=0.0):
+        lo = np.asarray(lo, dtype=float) - tol
+        hi = np.asarray(hi, dtype=float) + tol
+        ids = self.candidates(lo, hi)
+        p = self.points[ids]
+        return np.sort(ids[np.all((p >= lo) & (p <= hi), axis=1)])
+
+    def near(self, center, radius):
+        center = np.asarray(center, dtype=float)
+        ids = self.candidates(center - radius, center + radius)
+        d2 = ((self.points[ids] - center)**2).sum(axis=1)
+        return np.sort(ids[d2 <= radius**2])
+
+
+class MeshSets:
+    def __init__(self, nodes, elements, tol=None):
+        self.mesh_nodes = np.asarray(nodes)
+        self.mesh_elements = np.asarray(elements)
+        self.lo = self.mesh_nodes.min(axis=0)
+        self.hi = self.mesh_nodes.max(axis=0)
+        # default tolerance: a billionth of the mesh diagonal
+        self.tol = 1e-9 * np.hypot(*(self.hi - self.lo)) if tol is None else tol
+        self.nodes = {}      # name -> sorted node indices
+        self.elements = {}   # name -> sorted element indices
+        self._node_index = None
+        self._centroid_index = None
+
+    @property
+    def node_index(self):
+        if self._node_index is None:
+            self._node_index = GridIndex(self.mesh_nodes)
+        return self._node_index
+
+    @property
+    def centroids(self):
+        return self.centroid_index.points
+
+    @property
+    def centroid_index(self):
+        if self._centroid_index is None:
+            self._centroid_index = GridIndex(self.mesh_nodes[self.mesh_elements].mean(axis=1))
+        return self._centroid_index
+
+    def _select(self, points, index, predicate, box, circle):
+        """ Indices picked by one selector; index() builds the grid hash only when needed """
+        if sum(arg is not None for arg in (predicate, box, circle)) != 1:
+            raise ValueError("Give exactly one of predicate, box or circle")
+        if predicate is not None:
+            return np.flatnonzero(predicate(points[:, 0], points[:, 1]))
+        index = index()
+        if box is not None:
+            return index.in_box(box[0], box[1], self.tol)
+        center, radius = circle
+        return index.near(center, radius + self.tol)
+
+    def add_node_set(self, name, predicate=None, box=None, circle=None):
+        """ Tag nodes by predicate(x, y) -> bool array, box ((xmin, ymin), (xmax, ymax))
+        or circle ((x, y), radius); returns the index array """
+        ids = self._select(self.mesh_nodes, lambda: self.node_index, predicate, box, circle)
+        self.nodes[name] = ids
+        return ids
+
+    def add_element_set(self, name, predicate=None, box=None, circle=None, node_set=None, require_all=True):
+        """ Tag elements by their centroid (same selectors as add_node_set), or by
+        node_set: elements whose nodes are all (require_all) or any in that set """
+        if node_set is not None:
+            flag = np.zeros(len(self.mesh_nodes), dtype=bool)
+            flag[self.nodes[node_set]] = True
+            inside = flag[self.mesh_elements]
+            ids = np.flatnonzero(inside.all(axis=1) if require_all else inside.any(axis=1))
+        else:
+            ids = self._select(self.centroids, lambda: self.centroid_index, predicate, box, circle)
+        self.elements[name] = ids
+        return ids
+
+    def add_side(self, side, name=None):
+        """ Node set of one side of the mesh bounding box ('left', 'right', 'bottom', 'top') """
+        if side not in SIDES:
+            raise ValueError(f"Invalid side '{side}'. Use one of: {', '.join(SIDES)}")
+        lo, hi = self.lo.copy(), self.hi.copy()
+        axis = 0 if side in ('left', 'right') else 1
+        if side in ('left', 'bottom'):
+            hi[axis] = lo[axis]
+        else:
+            lo[axis] = hi[axis]
+        return self.add_node_set(name or side, box=(lo, hi))
+
+    def union(self, name, *names):
+        self.nodes[name] = np.unique(np.concatenate([self.nodes[n] for n in names]))
+        return self.nodes[name]
+
+    def boundary_conditions(self, name, ux=0.0, uy=0.0):
+        """ {node index: {'ux': ux, 'uy': uy}} for a node set """
+        return {int(node): {'ux': ux, 'uy': uy} for node in self.nodes[name]}
@@ -0,0 +1,159 @@
+import argparse
+import time
+import numpy as np
+
+import fake_gpio
+from telemetry import TelemetryLogger
+from wheel_controller import (WheelController, PID, ConstantProfile,
+                              LEFT_ENCODER_PIN, RIGHT_ENCODER_PIN, COUNTS_PER_REV)
+
+# Hardware-in-the-loop replay of recorded encoder edge traces.
+#
+# A trace is the list of edge times on each encoder pin.  Replay runs the real
+# WheelController (encoders, filters, PID laws, scheduler) against fake_gpio on
+# a virtual clock: every clock read advances simulated time by poll_ns, the
+# cost of one loop iteration, and sleep() jumps straight to the wake-up time.
+# Trace edges up to the current simulated time are applied to the fake pins as
+# the clock advances, so runs go as fast as the loop itself can execute.
+# Commanded duty cycles are recorded in fake_gpio.pwm_log.
+#
+# The trace is open loop: the recorded wheels do not react to the replayed
+# duty cycles, which is what a regression test of the loop code wants.
+
+
+class EdgeTrace:
+    def __init__(self, edges, initial=None):
+        self.edges = {pin: np.asarray(times, dtype=float) for pin, times in edges.items()}
+        self.initial = {pin: 0 for pin in self.edges} if initial is None else dict(initial)
+
+    @property
+    def duration(self):
+        return max((times[-1] for times in self.edges.values() if len(times)), default=0.0)
+
+    def save(self, path):
+        arrays = {f'pin_{pin}': times for pin, times in self.edges.items()}
+        arrays['initial'] = np.array([[pin, level] for pin, level in self.initial.items()])
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            edges = {int(name[4:]): data[name] for name in data.files if name.startswith('pin_')}
+            initial = {int(pin): int(level) for pin, level in data['initial']}
+        return cls(edges, initial)
+
+
+def record_trace(gpio, duration, pins=(LEFT_ENCODER_PIN, RIGHT_ENCODER_PIN)):
+    """ Record edge times on the encoder pins for duration seconds (on the Pi) """
+    edges = {pin: [] for pin in pins}
+    initial = {pin: gpio.input(pin) for pin in pins}
+    start = time.perf_counter()
+    for pin in pins:
+        gpio.add_event_detect(pin, gpio.BOTH,
+                              callback=lambda channel: edges[channel].append(time.perf_counter() - start))
+    time.sleep(duration)
+    for pin in pins:
+        gpio.remove_event_detect(pin)
+    return EdgeTrace(edges, initial)
+
+
+def synthesize_trace(rpm, duration, pins=(LEFT_ENCODER_PIN, RIGHT_ENCODER_PIN), counts_per_rev=COUNTS_PER_REV):
+    """ Trace of wheels turning at rpm(t) (callable or constant) RPM """
+    edges = {}
+    t = np.arange(0, duration, 1e-4)
+    for i, pin in enumerate(pins):
+        speed = rpm(t) if callable(rpm) else np.full_like(t, rpm)
+        speed = speed[i] if np.ndim(speed) == 2 else speed
+        counts = np.cumsum(speed / 60 * counts_per_rev * 1e-4)
+        crossings = np.flatnonzero(np.diff(np.floor(counts)) > 0) + 1
+        edges[pin] = t[crossings]
+    return EdgeTrace(edges)
+
+
+class VirtualClock:
+    """ Simulated perf_counter_ns/sleep pair that plays a trace into fake_gpio """
+
+    def __init__(self, trace, poll_ns=20_000):
+        self.now_ns = 0
+        self.poll_ns = poll_ns
+        self.pins = list(trace.edges)
+        self.times_ns = [np.rint(trace.edges[pin] * 1e9).astype(np.int64).tolist() for pin in self.pins]
+        self.cursor = [0] * len(self.pins)
+        self.levels = [trace.initial.get(pin, 0) for pin in self.pins]
+        fake_gpio.clock = self.seconds
+        for pin, level in zip(self.pins, self.levels):
+            fake_gpio.set_input(pin, level)
+
+    def seconds(self):
+        return self.now_ns / 1e9
+
+    def _advance(self, now_ns):
+        for i, times in enumerate(self.times_ns):
+            cursor = self.cursor[i]
+            while cursor < len(times) and times[cursor] <= now_ns:
+                self.levels[i] ^= 1
+                # fire callbacks at the edge's own time so bouncetime is honoured
+                self.now_ns = times[cursor]
+                fake_gpio.set_input(self.pins[i], self.levels[i])
+                cursor += 1
+            self.cursor[i] = cursor
+        self.now_ns = now_ns
+
+    def clock_ns(self):
+        self._advance(self.now_ns + self.poll_ns)
+        return self.now_ns
+
+    def sleep(self, seconds):
+        self._advance(self.now_ns + max(0, round(seconds * 1e9)))
+
+
+def replay(trace, left_law, right_law, profile, sample_time=0.1, poll_ns=20_000,
+           encoder_mode='poll', encoder_size=4):
+    """ Run the control loop against a trace, returns (telemetry data, pwm log, wall seconds) """
+    fake_gpio.cleanup()
+    fake_gpio.pwm_log.clear()
+    clock = VirtualClock(trace, poll_ns)
+    controller = WheelController.for_car(fake_gpio, left_law, right_law, sample_time,
+                                         encoder_mode=encoder_mode, encoder_size=encoder_size,
+                                         clock_ns=clock.clock_ns, sleep=clock.sleep)
+    telemetry = TelemetryLogger(['time', 'input_power_l', 'l_RPM', 'input_power_r', 'r_RPM'])
+
+    def log_sample(t, run, car):
+        telemetry.log(t, car.left.power, car.left.rpm, car.right.power, car.right.rpm)
+
+    start = time.perf_counter()
+    controller.run(profile, log_sample)
+    wall = time.perf_counter() - start
+    controller.close()
+    telemetry.close()
+    return telemetry.data(), list(fake_gpio.pwm_log), wall
+
+
+def benchmark(trace=None, duration=40.0, encoder_mode='poll', poll_ns=20_000):
+    """ Simulated seconds of the PID tuning loop per wall clock second """
+    if trace is None:
+        trace = synthesize_trace(lambda t: np.vstack([80 + 5 * np.sin(t), 78 + 5 * np.cos(t)]), duration)
+    left = PID.from_fopdt(1.16, 0.982, 0.346, bias=40)
+    right = PID.from_fopdt(1.094, 1.07, 0.171, bias=40)
+    data, pwm_log, wall = replay(trace, left, right, ConstantProfile(80, duration),
+                                 poll_ns=poll_ns, encoder_mode=encoder_mode)
+    return duration / wall, data, pwm_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an encoder edge trace through the control loop")
+    parser.add_argument('trace', nargs='?', help="trace .npz (a synthetic trace if omitted)")
+    parser.add_argument('--duration', type=float, default=40.0, help="simulated seconds")
+    parser.add_argument('--mode', default='poll', choices=['poll', 'interrupt'], help="encoder mode")
+    parser.add_argument('--poll-us', type=float, default=20.0, help="simulated cost of one loop iteration")
+    args = parser.parse_args()
+
+    trace = EdgeTrace.load(args.trace) if args.trace else None
+    speed, data, pwm_log = benchmark(trace, args.duration, args.mode, round(args.poll_us * 1000))
+    print(f"{len(data)} samples, {len(pwm_log)} duty cycle changes, final RPM "
+          f"{data['l_RPM'][-1]:.1f} / {data['r_RPM'][-1]:.1f}")
+    print(f"{speed:.1f} simulated seconds per wall second")
+
+
+if __name__ == "__main__":
+    main()
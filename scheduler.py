@@ -0,0 +1,148 @@
+import time
+import numpy as np
+
+# Fixed-rate scheduler for the control loop.
+#
+# Deadlines are absolute multiples of the period from the start of the run on
+# the monotonic perf_counter_ns clock, so a slow iteration does not push the
+# following samples later (no drift), and a late tick is never followed by a
+# burst of catch-up ticks: whole periods that were missed are skipped and
+# counted instead.  Tick statistics accumulate over every run() until
+# reset(), so one report can cover a whole multi-trial sweep.
+
+JITTER_BINS_US = np.array([0, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, np.inf])
+
+
+class PeriodicScheduler:
+    def __init__(self, period, clock_ns=time.perf_counter_ns, sleep=time.sleep, spin_ns=200_000):
+        self.period = period
+        self.period_ns = round(period * 1e9)
+        self.clock_ns = clock_ns
+        self.sleep = sleep
+        self.spin_ns = spin_ns  # busy-wait the last stretch instead of trusting sleep()
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.missed = 0      # deadlines skipped because a whole period had passed
+        self.overruns = 0    # ticks whose own work ran past the next deadline
+        self.lateness_ns = np.zeros(0, dtype=np.int64)
+        self.interval_ns = np.zeros(0, dtype=np.int64)
+        self.work_ns = np.zeros(0, dtype=np.int64)
+
+    def run(self, duration, tick, idle=None):
+        """ Call tick(t, dt) every period until t reaches duration
+
+        The run's ticks are added to the statistics of earlier runs.
+        t is the time since the start and dt the time since the previous tick,
+        both in seconds from the same clock reading.  idle() is called while
+        waiting (e.g. to poll encoders); without it the scheduler sleeps.
+        """
+        clock_ns = self.clock_ns
+        sleep = self.sleep
+        spin_ns = self.spin_ns
+        period_ns = self.period_ns
+        duration_ns = round(duration * 1e9)
+
+        # preallocated so recording a tick never allocates
+        max_ticks = duration_ns // period_ns + 1
+        lateness = np.zeros(max_ticks, dtype=np.int64)
+        interval = np.zeros(max_ticks, dtype=np.int64)
+        work = np.zeros(max_ticks, dtype=np.int64)
+        ticks = 0
+        missed = 0
+        overruns = 0
+
+        start = clock_ns()
+        deadline = start + period_ns
+        last = start
+        end = start + duration_ns
+        while deadline <= end:
+            now = clock_ns()
+            remaining = deadline - now
+            if remaining > 0:
+                if idle is not None:
+                    idle()
+                elif remaining > spin_ns:
+                    sleep((remaining - spin_ns) / 1e9)
+                continue
+
+            late = -remaining
+            if late >= period_ns:
+                skipped = late // period_ns
+                missed += skipped
+                deadline += skipped * period_ns
+                if deadline > end:
+                    break
+
+            tick((now - start) / 1e9, (now - last) / 1e9)
+            done = clock_ns()
+
+            lateness[ticks] = late
+            interval[ticks] = now - last
+            work[ticks] = done - now
+            ticks += 1
+            deadline += period_ns
+            if done > deadline:
+                overruns += 1
+            last = now
+
+        self.lateness_ns = np.concatenate([self.lateness_ns, lateness[:ticks]])
+        self.interval_ns = np.concatenate([self.interval_ns, interval[:ticks]])
+        self.work_ns = np.concatenate([self.work_ns, work[:ticks]])
+        self.ticks += ticks
+        self.missed += missed
+        self.overruns += overruns
+
+    def jitter_histogram(self, bins_us=JITTER_BINS_US):
+        """ Counts of tick lateness (microseconds after the deadline) per bin """
+        counts, _ = np.histogram(self.lateness_ns / 1e3, bins=bins_us)
+        return counts, bins_us
+
+    def interval_histogram(self, bins_us=JITTER_BINS_US):
+        """ Counts of |actual interval - period| (microseconds) per bin """
+        deviation = np.abs(self.interval_ns[1:] - self.period_ns) / 1e3
+        counts, _ = np.histogram(deviation, bins=bins_us)
+        return counts, bins_us
+
+    def report(self):
+        lines = [f"Scheduler: {self.ticks} ticks at {self.period * 1000:g} ms, "
+                 f"{self.missed} missed deadlines, {self.overruns} overruns"]
+        if self.ticks:
+            lines.append(f"  lateness us: mean {self.lateness_ns.mean() / 1e3:.1f}, "
+                         f"max {self.lateness_ns.max() / 1e3:.1f}; "
+                         f"tick work us: mean {self.work_ns.mean() / 1e3:.1f}, "
+                         f"max {self.work_ns.max() / 1e3:.1f}")
+            for name, (counts, bins) in (('lateness', self.jitter_histogram()),
+                                         ('period error', self.interval_histogram())):
+                lines.append(f"  {name} histogram (us):")
+                for low, high, count in zip(bins[:-1], bins[1:], counts):
+                    if count:
+                        lines.append(f"    {low:>7g} - {high:<7g} {count}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Compare the drift of the old t_sample += SAMPLE_TIME loop on time.time()
+    # with the scheduler, each doing 5 ms of work per 10 ms tick
+    period = 0.01
+    duration = 2.0
+    work = 0.005
+
+    samples = []
+    t_start = time.time()
+    t_sample = period
+    t = 0
+    while t < duration:
+        t = time.time() - t_start
+        if t >= t_sample:
+            t_sample += period
+            samples.append(t)
+            time.sleep(work)
+    intervals = np.diff(samples)
+    print(f"t_sample loop: {len(samples)} ticks, interval std {intervals.std() * 1e6:.0f} us, "
+          f"max {intervals.max() * 1e3:.2f} ms")
+
+    scheduler = PeriodicScheduler(period)
+    scheduler.run(duration, lambda t, dt: time.sleep(work))
+    print(scheduler.report())
@@ -0,0 +1,164 @@
+import argparse
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+
+from telemetry import read_telemetry
+
+# Analysis of rc_car.py power sweeps (encoder_data.csv or the telemetry .bin).
+#
+# The file is parsed once into columns, sorted by (power_level, trial, time),
+# and every run is a slice of those columns, so looking up a run is a dict
+# lookup instead of re-reading the file.  Plots are drawn on off-screen
+# Figures and written to one multi-page PDF.
+
+
+class SweepData:
+    def __init__(self, columns):
+        order = np.lexsort((columns['time'], columns['trial'], columns['power_level']))
+        self.columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+        power = self.columns['power_level'].astype(int)
+        trial = self.columns['trial'].astype(int)
+
+        # run boundaries where (power, trial) changes in the sorted columns
+        starts = np.flatnonzero(np.r_[True, (np.diff(power) != 0) | (np.diff(trial) != 0)])
+        ends = np.r_[starts[1:], len(power)]
+        self.runs = {(int(power[s]), int(trial[s])): slice(s, e) for s, e in zip(starts, ends)}
+        self.power_levels = sorted({p for p, _ in self.runs})
+        self.trials = sorted({t for _, t in self.runs})
+
+    @classmethod
+    def load(cls, path):
+        """ Read a sweep CSV (title line, header line, rows) or a telemetry .bin file """
+        if path.endswith('.bin'):
+            data = read_telemetry(path)
+            return cls({name: np.array(data[name]) for name in data.dtype.names})
+        with open(path) as f:
+            first = f.readline()
+            # the header follows an optional 'Encoder Data' title line
+            header = first if first.startswith('time') else f.readline()
+            names = [name.strip() for name in header.split(',')]
+            data = np.loadtxt(f, delimiter=',', ndmin=2)
+        return cls({name: data[:, i] for i, name in enumerate(names)})
+
+    def run(self, power, trial):
+        """ {column: array} for one run """
+        rows = self.runs[(power, trial)]
+        return {name: values[rows] for name, values in self.columns.items()}
+
+
+def steady_state_rpm(sweep, fraction=0.3):
+    """ Mean RPM over the last `fraction` of every run
+
+    Returns (power_levels, trials, left, right) with left/right shaped
+    (n_power, n_trial), NaN where a run is missing.
+    """
+    powers, trials = sweep.power_levels, sweep.trials
+    left = np.full((len(powers), len(trials)), np.nan)
+    right = np.full_like(left, np.nan)
+    time = sweep.columns['time']
+    for (power, trial), rows in sweep.runs.items():
+        t = time[rows]
+        tail = t >= t[-1] - fraction * (t[-1] - t[0])
+        i, j = powers.index(power), trials.index(trial)
+        left[i, j] = sweep.columns['l_RPM'][rows][tail].mean()
+        right[i, j] = sweep.columns['r_RPM'][rows][tail].mean()
+    return np.array(powers), np.array(trials), left, right
+
+
+def imbalance(left, right):
+    """ Left minus right as a percentage of the mean of both wheels """
+    mean = (left + right) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mean > 0, (left - right) / mean * 100, np.nan)
+
+
+def dead_band(powers, rpm, threshold=1.0):
+    """ Power below which the wheel does not turn
+
+    Extrapolates a line through the levels where the wheel moves back to zero
+    RPM, kept between the highest still level and the lowest moving level.
+    """
+    moving = rpm > threshold
+    if not moving.any():
+        return np.nan
+    first = np.argmax(moving)
+    upper = powers[first]
+    lower = powers[first - 1] if first > 0 else 0.0
+    if moving.sum() < 2:
+        return float(upper)
+    slope, intercept = np.polyfit(powers[moving], rpm[moving], 1)
+    return float(np.clip(-intercept / slope, lower, upper)) if slope > 0 else float(upper)
+
+
+def summarize(sweep, fraction=0.3, threshold=1.0):
+    powers, trials, left, right = steady_state_rpm(sweep, fraction)
+    left_mean = np.nanmean(left, axis=1)
+    right_mean = np.nanmean(right, axis=1)
+    return {
+        'power': powers,
+        'l_RPM': left_mean,
+        'r_RPM': right_mean,
+        'l_RPM_std': np.nanstd(left, axis=1),
+        'r_RPM_std': np.nanstd(right, axis=1),
+        'imbalance': imbalance(left_mean, right_mean),
+        'l_dead_band': dead_band(powers, left_mean, threshold),
+        'r_dead_band': dead_band(powers, right_mean, threshold),
+    }
+
+
+def plot_runs_pdf(sweep, path, summary=None):
+    """ One page per (power, trial) run plus a summary page, all off-screen """
+    with PdfPages(path) as pdf:
+        if summary is not None:
+            fig = Figure(figsize=(12, 6))
+            ax1, ax2 = fig.subplots(1, 2)
+            ax1.plot(summary['power'], summary['l_RPM'], 'o-', color='blue', label='Left Wheel')
+            ax1.plot(summary['power'], summary['r_RPM'], 'o-', color='red', label='Right Wheel')
+            for wheel, color in (('l', 'blue'), ('r', 'red')):
+                if not np.isnan(summary[f'{wheel}_dead_band']):
+                    ax1.axvline(summary[f'{wheel}_dead_band'], color=color, linestyle='--', alpha=0.5)
+            ax1.set_title('Steady-State RPM vs. Power Level')
+            ax1.set_xlabel('Power Level (%)')
+            ax1.set_ylabel('RPM')
+            ax1.legend()
+            ax1.grid()
+            ax2.bar(summary['power'], summary['imbalance'], width=5, color='gray')
+            ax2.set_title('Left/Right Imbalance')
+            ax2.set_xlabel('Power Level (%)')
+            ax2.set_ylabel('(Left - Right) / Mean (%)')
+            ax2.grid()
+            pdf.savefig(fig)
+
+        for (power, trial) in sorted(sweep.runs):
+            run = sweep.run(power, trial)
+            fig = Figure(figsize=(12, 6))
+            ax = fig.subplots()
+            ax.plot(run['time'], run['l_RPM'], label='Left Wheel RPM', color='blue', alpha=0.6)
+            ax.plot(run['time'], run['r_RPM'], label='Right Wheel RPM', color='red', alpha=0.6)
+            ax.set_title(f'RPM vs. Time for Both Wheels - Power Level: {power}%, Trial: {trial}')
+            ax.set_xlabel('Time (seconds)')
+            ax.set_ylabel('RPM')
+            ax.legend()
+            ax.grid()
+            pdf.savefig(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze an rc_car.py power sweep")
+    parser.add_argument('data', help="encoder_data.csv or telemetry .bin")
+    parser.add_argument('-o', '--output', default='sweep_report.pdf', help="PDF of the runs")
+    args = parser.parse_args()
+
+    sweep = SweepData.load(args.data)
+    summary = summarize(sweep)
+    print("power  l_RPM   r_RPM   imbalance")
+    for row in zip(summary['power'], summary['l_RPM'], summary['r_RPM'], summary['imbalance']):
+        print(f"{row[0]:>5} {row[1]:>7.1f} {row[2]:>7.1f} {row[3]:>9.1f}%")
+    print(f"Dead band: left below {summary['l_dead_band']:.1f}%, right below {summary['r_dead_band']:.1f}%")
+    plot_runs_pdf(sweep, args.output, summary)
+    print(f"Plots saved to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+# Telemetry sink for the motor runs.
+#
+# log() copies one sample into a preallocated structured NumPy chunk - no string
+# formatting or file I/O in the control loop.  Full chunks are handed to a
+# background thread that appends them to a binary file, and the CSV the
+# analysis expects is written once when the run is over.
+#
+# Binary layout: b'TLM1', uint32 header length, JSON header (column dtype),
+# then the records back to back, so read_telemetry() can memory-map it.
+
+MAGIC = b'TLM1'
+
+
+def telemetry_dtype(columns):
+    """ Column names (float64) or (name, dtype) pairs -> structured dtype """
+    return np.dtype([(c, np.float64) if isinstance(c, str) else tuple(c) for c in columns])
+
+
+class TelemetryLogger:
+    def __init__(self, columns, path=None, chunk_size=1024, echo_every=0):
+        self.dtype = telemetry_dtype(columns)
+        self.columns = self.dtype.names
+        self.path = path
+        self.chunk_size = chunk_size
+        self.echo_every = echo_every  # print every n-th sample, 0 for no console output
+        self.rows = 0
+
+        self._chunk = np.zeros(chunk_size, dtype=self.dtype)
+        self._n = 0
+        self._chunks = []  # filled chunks kept in memory when there is no file
+        self._file = None
+        if path is not None:
+            self._file = open(path, 'wb')
+            header = json.dumps({'dtype': self.dtype.descr}).encode()
+            self._file.write(MAGIC + np.uint32(len(header)).tobytes() + header)
+            # two spare chunks so log() keeps going while one is being written
+            self._free = queue.Queue()
+            for _ in range(2):
+                self._free.put(np.zeros(chunk_size, dtype=self.dtype))
+            self._pending = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def log(self, *values):
+        self._chunk[self._n] = values
+        self._n += 1
+        self.rows += 1
+        if self.echo_every and self.rows % self.echo_every == 0:
+            print(' '.join(f'{name}={value:.02f}' for name, value in zip(self.columns, values)))
+        if self._n == self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        chunk, n = self._chunk, self._n
+        if self._file is None:
+            self._chunks.append(chunk[:n])
+            self._chunk = np.zeros(self.chunk_size, dtype=self.dtype)
+        else:
+            self._pending.put((chunk, n))
+            try:
+                self._chunk = self._free.get_nowait()
+            except queue.Empty:
+                # the writer is behind, never block the control loop on it
+                self._chunk = np.zeros(self.chunk_size, dtype=self.dtype)
+        self._n = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            chunk, n = item
+            self._file.write(chunk[:n].tobytes())
+            self._free.put(chunk)
+
+    def close(self):
+        """ Write out the last partial chunk and stop the writer thread """
+        if self._n:
+            self._flush_chunk()
+        if self._file is not None and not self._file.closed:
+            self._pending.put(None)
+            self._writer.join()
+            self._file.close()
+
+    def data(self):
+        """ All samples logged so far (call close() first when logging to a file) """
+        if self._file is not None:
+            return read_telemetry(self.path)
+        parts = self._chunks + [self._chunk[:self._n]]
+        return np.concatenate(parts)
+
+    def export_csv(self, path, title=None, fmt='%.2f', block_size=65536):
+        export_csv(self.data(), path, title, fmt, block_size)
+
+
+def read_telemetry(path):
+    """ Memory-map a binary telemetry file as a structured array """
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a telemetry file")
+        header_len = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+        header = json.loads(f.read(header_len))
+    dtype = np.dtype([tuple(field) for field in header['dtype']])
+    offset = 8 + header_len
+    if os.path.getsize(path) == offset:
+        return np.zeros(0, dtype=dtype)  # np.memmap cannot map an empty region
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset)
+
+
+def export_csv(data, path, title=None, fmt='%.2f', block_size=65536):
+    """ Write the records as CSV with the column names as the header line
+
+    fmt is one format for every column or a list with one per column.
+    """
+    with open(path, 'w') as f:
+        if title is not None:
+            f.write(f'{title}\n')
+        f.write(','.join(data.dtype.names) + '\n')
+        for start in range(0, len(data), block_size):
+            block = data[start:start + block_size]
+            columns = np.column_stack([block[name] for name in data.dtype.names])
+            np.savetxt(f, columns, fmt=fmt, delimiter=',')
@@ -0,0 +1,67 @@
+import math
+
+# Controller tuning correlations used by the motor scripts.
+# Each rule returns (Kc, TI, TD); TI = inf disables the integral term and
+# TD = 0 the derivative term.
+#
+# FOPDT model: K = process gain, tau = time constant, theta = dead time (t0)
+
+
+def itae_pid(K, tau, theta):
+    """ ITAE setpoint-tracking PID tuning for a FOPDT process """
+    Kc = (0.965 / K) * (theta / tau) ** (-0.85)
+    TI = tau / (0.796 - 0.1465 * (theta / tau))
+    TD = 0.308 * tau * (theta / tau) ** 0.929
+    return Kc, TI, TD
+
+
+def itae_pi(K, tau, theta):
+    """ ITAE setpoint-tracking PI tuning for a FOPDT process """
+    Kc = (0.586 / K) * (theta / tau) ** (-0.916)
+    TI = tau / (1.03 - 0.165 * (theta / tau))
+    return Kc, TI, 0.0
+
+
+def ziegler_nichols(Ku, Pu=math.inf, kind='P'):
+    """ Ziegler-Nichols closed-loop (ultimate gain) rules
+
+    Ku is the proportional gain giving sustained oscillation, Pu its period.
+    kind='P' with Pu unknown is the proportional-only run used to find Ku.
+    """
+    if kind == 'P':
+        return Ku / 2, math.inf, 0.0
+    elif kind == 'PI':
+        return 0.45 * Ku, Pu / 1.2, 0.0
+    elif kind == 'PID':
+        return 0.6 * Ku, Pu / 2, Pu / 8
+    else:
+        raise ValueError("Invalid Ziegler-Nichols controller. Use 'P', 'PI' or 'PID'.")
+
+
+def zn_open_loop(K, tau, theta, kind='PID'):
+    """ Ziegler-Nichols open-loop (reaction curve) rules for a FOPDT process """
+    if kind == 'P':
+        return tau / (K * theta), math.inf, 0.0
+    elif kind == 'PI':
+        return 0.9 * tau / (K * theta), 3.33 * theta, 0.0
+    elif kind == 'PID':
+        return 1.2 * tau / (K * theta), 2 * theta, 0.5 * theta
+    else:
+        raise ValueError("Invalid Ziegler-Nichols controller. Use 'P', 'PI' or 'PID'.")
+
+
+def imc_pi(K, tau, theta, tau_c=None):
+    """ IMC PI tuning; the closed-loop time constant defaults to max(0.1 tau, 0.8 theta) """
+    if tau_c is None:
+        tau_c = max(0.1 * tau, 0.8 * theta)
+    return tau / (K * (tau_c + theta)), tau, 0.0
+
+
+def imc_pid(K, tau, theta, tau_c=None):
+    """ IMC PID tuning; the closed-loop time constant defaults to max(0.1 tau, 0.8 theta) """
+    if tau_c is None:
+        tau_c = max(0.1 * tau, 0.8 * theta)
+    Kc = (tau + theta / 2) / (K * (tau_c + theta / 2))
+    TI = tau + theta / 2
+    TD = tau * theta / (2 * tau + theta)
+    return Kc, TI, TD
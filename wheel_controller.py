@@ -0,0 +1,296 @@
+import math
+import time
+
+from encoder import make_encoder
+from filters import make_filter
+from scheduler import PeriodicScheduler
+import tuning_rules
+
+# Dual-wheel control engine shared by the tuning, step test and power sweep
+# scripts.  A run is configured from three pieces:
+#   - a control law per wheel (OpenLoop, P, PI, PID) turning a command into power
+#   - a profile yielding the runs to do and the command over time for each
+#   - an optional on_sample(t, run, controller) callback for logging
+#
+# Board wiring of the car: left encoder pin 5 / PWM pin 21, right encoder
+# pin 3 / PWM pin 19.
+
+LEFT_ENCODER_PIN = 5
+RIGHT_ENCODER_PIN = 3
+LEFT_PWM_PIN = 21
+RIGHT_PWM_PIN = 19
+
+COUNTS_PER_REV = 40         # encoder edges per wheel revolution
+WHEEL_DIAMETER = 2.5 * 0.0254  # meters
+
+
+def pid_step(error, prev_error, integral, dt, Kc, TI, TD):
+    """ One PID update, returns (P + I + D, new integral)
+
+    Plain arithmetic so it works on scalars and on NumPy arrays of gains.
+    TI = inf turns the integral term off, TD = 0 the derivative term.
+    """
+    integral = integral + Kc * error * dt / TI
+    derivative = Kc * TD * (error - prev_error) / dt
+    return Kc * error + integral + derivative, integral
+
+
+# Control laws.  update() receives the wheel (for its rpm and controller state),
+# the profile command and the time since the previous sample.
+
+class OpenLoop:
+    """ The command is the power level itself (step tests and power sweeps) """
+    __slots__ = ()
+    closed_loop = False
+
+    def update(self, wheel, command, dt):
+        return command
+
+
+class PID:
+    """ The command is the RPM setpoint """
+    __slots__ = ('Kc', 'TI', 'TD', 'bias')
+    closed_loop = True
+
+    def __init__(self, Kc, TI=math.inf, TD=0.0, bias=0.0):
+        self.Kc = Kc
+        self.TI = TI
+        self.TD = TD
+        self.bias = bias  # to avoid the power being zero
+
+    @classmethod
+    def from_fopdt(cls, K, tau, theta, bias=0.0, rule=tuning_rules.itae_pid):
+        return cls.from_gains(rule(K, tau, theta), bias)
+
+    @classmethod
+    def from_gains(cls, gains, bias=0.0):
+        Kc, TI, TD = gains
+        return cls(Kc, TI, TD, bias)
+
+    def update(self, wheel, command, dt):
+        error = command - wheel.rpm
+        output, wheel.integral = pid_step(error, wheel.prev_error, wheel.integral, dt,
+                                          self.Kc, self.TI, self.TD)
+        wheel.prev_error = error
+        return output + self.bias
+
+
+class PI(PID):
+    __slots__ = ()
+
+    def __init__(self, Kc, TI, bias=0.0):
+        PID.__init__(self, Kc, TI, 0.0, bias)
+
+    @classmethod
+    def from_gains(cls, gains, bias=0.0):
+        Kc, TI, TD = gains
+        if TD != 0:
+            raise ValueError(f"A PI law has no derivative term, got TD = {TD}")
+        return cls(Kc, TI, bias)
+
+    @classmethod
+    def from_fopdt(cls, K, tau, theta, bias=0.0, rule=tuning_rules.itae_pi):
+        return cls.from_gains(rule(K, tau, theta), bias)
+
+
+class P(PID):
+    __slots__ = ()
+
+    def __init__(self, Kc, bias=0.0):
+        PID.__init__(self, Kc, math.inf, 0.0, bias)
+
+    @classmethod
+    def from_gains(cls, gains, bias=0.0):
+        Kc, TI, TD = gains
+        if TI != math.inf or TD != 0:
+            raise ValueError(f"A P law has no integral or derivative term, got TI = {TI}, TD = {TD}")
+        return cls(Kc, bias)
+
+    @classmethod
+    def ziegler_nichols(cls, Ku, bias=0.0):
+        """ Proportional-only run for finding the ultimate gain """
+        return cls.from_gains(tuning_rules.ziegler_nichols(Ku, kind='P'), bias)
+
+
+# Profiles.  runs() yields Run objects; command(t) is evaluated at every sample.
+
+class Run:
+    __slots__ = ('duration', 'command', 'tags')
+
+    def __init__(self, duration, command, **tags):
+        self.duration = duration
+        self.command = command
+        self.tags = tags  # e.g. trial and power_level, available to on_sample
+
+
+class ConstantProfile:
+    """ A single run holding one command, e.g. an RPM setpoint """
+
+    def __init__(self, value, duration, trial=1):
+        self.value = value
+        self.duration = duration
+        self.trial = trial
+
+    def runs(self):
+        value = self.value
+        yield Run(self.duration, lambda t: value, trial=self.trial)
+
+
+class StepProfile:
+    """ A single run stepping through (start_time, command) pairs, e.g. 50% then 70% """
+
+    def __init__(self, steps=((0, 50), (10, 70)), duration=20, trial=1):
+        self.steps = sorted(steps)
+        self.duration = duration
+        self.trial = trial
+
+    def runs(self):
+        starts = [start for start, _ in self.steps]
+        levels = [level for _, level in self.steps]
+
+        def command(t):
+            level = levels[0]
+            for start, value in zip(starts, levels):
+                if t < start:
+                    break
+                level = value
+            return level
+
+        yield Run(self.duration, command, trial=self.trial)
+
+
+class SweepProfile:
+    """ num_trials runs at each level in turn, e.g. power 10% to 100% """
+
+    def __init__(self, levels=range(10, 110, 10), num_trials=3, duration=10):
+        self.levels = list(levels)
+        self.num_trials = num_trials
+        self.duration = duration
+
+    def runs(self):
+        for level in self.levels:
+            for trial in range(1, self.num_trials + 1):
+                yield Run(self.duration, lambda t, level=level: level,
+                          trial=trial, power_level=level)
+
+
+class Wheel:
+    """ Encoder, PWM output, control law and the state the loop keeps per wheel """
+    __slots__ = ('name', 'encoder', 'pwm', 'law', 'count', 'count_prev', 'rpm',
+                 'rpm_filter', 'power', 'integral', 'prev_error', 'distance',
+                 'circumference', 'counts_per_rev')
+
+    def __init__(self, name, encoder, pwm, law, rpm_filter=None,
+                 counts_per_rev=COUNTS_PER_REV, wheel_diameter=WHEEL_DIAMETER):
+        self.name = name
+        self.encoder = encoder
+        self.pwm = pwm
+        self.law = law
+        self.counts_per_rev = counts_per_rev
+        self.circumference = math.pi * wheel_diameter
+        self.rpm_filter = make_filter() if rpm_filter is None else rpm_filter
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.count_prev = 0
+        self.rpm = 0.0
+        self.rpm_filter.reset()
+        self.power = 0.0
+        self.integral = 0.0
+        self.prev_error = 0.0
+        self.distance = 0.0
+
+    def update_rpm(self, dt):
+        # RPM over the last sample, smoothed by the filter stage
+        rpm_now = (self.count - self.count_prev) / self.counts_per_rev * 60 / dt
+        self.rpm = self.rpm_filter.update(rpm_now, dt)
+        self.count_prev = self.count
+        self.distance += self.rpm / 60 * self.circumference * dt
+
+    def update_power(self, command, dt):
+        power = self.law.update(self, command, dt)
+        if power > 100:
+            power = 100
+        elif power < 0:
+            power = 0
+        self.power = power
+        self.pwm.ChangeDutyCycle(power)
+        return power
+
+
+class WheelController:
+    def __init__(self, left, right, sample_time=0.1, clock_ns=time.perf_counter_ns, sleep=time.sleep):
+        self.left = left
+        self.right = right
+        self.sample_time = sample_time
+        # jitter, overrun and missed deadline stats of the latest run
+        self.scheduler = PeriodicScheduler(sample_time, clock_ns, sleep)
+
+    @classmethod
+    def for_car(cls, gpio, left_law, right_law, sample_time=0.1, frequency=100,
+                encoder_mode='poll', encoder_size=4, rpm_window=20, rpm_filter='moving_average',
+                **kwargs):
+        """ Configure the car's pins on gpio (RPi.GPIO or fake_gpio) and build the controller
+
+        rpm_filter is 'moving_average', 'ema' or 'lowpass' over rpm_window samples.
+        """
+        gpio.cleanup()
+        gpio.setmode(gpio.BOARD)
+        gpio.setup(LEFT_ENCODER_PIN, gpio.IN)
+        gpio.setup(RIGHT_ENCODER_PIN, gpio.IN)
+        gpio.setup(RIGHT_PWM_PIN, gpio.OUT)
+        gpio.setup(LEFT_PWM_PIN, gpio.OUT)
+
+        left = Wheel('l', make_encoder(gpio, LEFT_ENCODER_PIN, encoder_mode, encoder_size),
+                     gpio.PWM(LEFT_PWM_PIN, frequency), left_law,
+                     make_filter(rpm_filter, rpm_window, sample_time))
+        right = Wheel('r', make_encoder(gpio, RIGHT_ENCODER_PIN, encoder_mode, encoder_size),
+                      gpio.PWM(RIGHT_PWM_PIN, frequency), right_law,
+                      make_filter(rpm_filter, rpm_window, sample_time))
+        return cls(left, right, sample_time, **kwargs)
+
+    def run(self, profile, on_sample=None):
+        """ Every run of the profile; scheduler stats cover all of them """
+        self.scheduler.reset()
+        for run in profile.runs():
+            self.run_once(run, on_sample)
+
+    def run_once(self, run, on_sample=None):
+        left = self.left
+        right = self.right
+        left_encoder = left.encoder
+        right_encoder = right.encoder
+        command = run.command
+
+        for wheel in (left, right):
+            wheel.reset()
+            wheel.encoder.poll()  # drop edges counted before the run
+            wheel.power = 0 if wheel.law.closed_loop else command(0)
+            wheel.pwm.start(wheel.power)
+
+        def poll():
+            left.count += left_encoder.poll()
+            right.count += right_encoder.poll()
+
+        def sample(t, dt):
+            poll()
+            value = command(t)
+            left.update_rpm(dt)
+            right.update_rpm(dt)
+            left.update_power(value, dt)
+            right.update_power(value, dt)
+            if on_sample is not None:
+                on_sample(t, run, self)
+
+        # polling encoders are read while waiting for the next sample,
+        # interrupt encoders count in their callbacks so the loop sleeps
+        busy_wait = left_encoder.needs_polling or right_encoder.needs_polling
+        self.scheduler.run(run.duration, sample, poll if busy_wait else None)
+
+        left.pwm.stop()
+        right.pwm.stop()
+
+    def close(self):
+        self.left.encoder.close()
+        self.right.encoder.close()